@@ -0,0 +1,57 @@
+# Control de admisión para las rutas que generan PDFs
+#
+# Con workers gthread cada solicitud de PDF ocupa un hilo mientras el pool
+# de procesos de reportes.py genera el documento. Sin un límite, una
+# descarga masiva de certificados encola cientos de documentos en el pool y
+# deja todos los hilos del worker esperando, incluidos los que deberían
+# servir las páginas HTML. ControlAdmision limita las solicitudes de PDF
+# simultáneas de cada worker (PDF_MAX_SIMULTANEAS); las que exceden el
+# límite esperan un cupo hasta PDF_ESPERA_ADMISION segundos y, si no se
+# libera, reciben 503 con Retry-After para que el cliente reintente.
+import functools
+import os
+import threading
+from flask import current_app, g, request
+from werkzeug.exceptions import ServiceUnavailable
+import metricas
+
+class ControlAdmision:
+    def __init__(self, app=None):
+        self.app = None
+        self._cupos = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PDF_MAX_SIMULTANEAS', None)  # None = 2 por proceso del pool de PDFs
+        app.config.setdefault('PDF_ESPERA_ADMISION', 2.0)  # Segundos esperando un cupo
+        app.config.setdefault('PDF_REINTENTAR_EN', 5)  # Retry-After de las respuestas 503
+        limite = app.config['PDF_MAX_SIMULTANEAS'] or 2 * (app.config['PDF_PROCESOS'] or os.cpu_count() or 1)
+        self._cupos = threading.BoundedSemaphore(limite)
+        self.app = app
+        app.extensions['admision'] = self
+        app.teardown_request(self._liberar)
+
+    def limitar(self, vista):
+        """Decorador para las vistas que generan PDFs.
+
+        El cupo se libera al cerrar el contexto de la solicitud; en las
+        descargas por partes (``stream_with_context``) eso ocurre cuando
+        termina el envío. Las solicitudes con ``?diferido=1`` sólo encolan un
+        trabajo y no necesitan cupo.
+        """
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            if not request.args.get('diferido'):
+                if not self._cupos.acquire(timeout=current_app.config['PDF_ESPERA_ADMISION']):
+                    metricas.ADMISION_RECHAZOS.inc(endpoint=request.endpoint)
+                    raise ServiceUnavailable('Hay demasiados documentos en preparación; '
+                                             'intente nuevamente en unos segundos.',
+                                             retry_after=current_app.config['PDF_REINTENTAR_EN'])
+                g.admision_cupo = True
+            return vista(*args, **kwargs)
+        return envoltura
+
+    def _liberar(self, error):
+        if g.pop('admision_cupo', False):
+            self._cupos.release()
@@ -1,121 +1,125 @@
 # Configuración inicial
+import io
 import os
+import shutil
+import zipfile
+from collections import namedtuple
 from datetime import datetime
 import locale
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
-from flask_sqlalchemy import SQLAlchemy
-from fpdf import FPDF
-
-# Configurar locale para fechas en español
-try:
-    locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-except:
+import click
+from flask import (Flask, Blueprint, Response, current_app, render_template, request, redirect,
+                   url_for, flash, send_file, jsonify, abort, stream_with_context)
+from modelos import (db, ASIGNATURAS, Curso, Alumno, Nota, Trabajo, PromedioAlumno,
+                     PromedioCurso, cargar_notas)
+from admision import ControlAdmision
+from cache_paginas import CachePaginas
+from cache_pdf import CachePDF
+from metricas import Metricas
+from trabajos import ColaTrabajos
+import archivo_zip
+import base_datos
+import busqueda
+import exportacion
+import importacion
+import metricas
+import migraciones
+import paginacion
+import planilla
+import promedios
+import reportes
+import trabajos
+
+# cli_group=None: los comandos del blueprint quedan directo bajo ``flask``
+bp = Blueprint('web', __name__, cli_group=None)
+admision = ControlAdmision()
+cache_paginas = CachePaginas()
+cache_pdf = CachePDF()
+cola_trabajos = ColaTrabajos()
+metricas_app = Metricas()
+
+def configurar_locale():
+    # Configurar locale para fechas en español
     try:
-        locale.setlocale(locale.LC_TIME, 'es_CL.UTF-8')
+        locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
     except:
-        print("No se pudo configurar el idioma español para las fechas")
-
-# Configuración de la aplicación Flask
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'clave-secreta-123'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///notas.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# Constantes
-ASIGNATURAS = [
-    'Matemáticas',
-    'Lenguaje',
-    'Inglés', 
-    'Cs. Sociales',
-    'Cs. Naturales',
-    'Instrumental'
-]
-
-# Modelos
-class Curso(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(50), unique=True, nullable=False)
-    alumnos = db.relationship('Alumno', backref='curso_rel', lazy=True)
-
-    def __repr__(self):
-        return self.nombre
-
-class Alumno(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    nombre_completo = db.Column(db.String(100), nullable=False)
-    curso_id = db.Column(db.Integer, db.ForeignKey('curso.id'), nullable=False)
-    numero_lista = db.Column(db.Integer)
-    notas = db.relationship('Nota', backref='alumno', lazy=True, cascade='all, delete-orphan')
-
-    def obtener_promedio_asignatura(self, asignatura):
-        notas_asignatura = [n for n in self.notas if n.asignatura == asignatura]
-        if notas_asignatura:
-            notas = notas_asignatura[0].lista_calificaciones
-            return sum(notas) / len(notas) if notas else 0
-        return 0
-
-class Nota(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    asignatura = db.Column(db.String(50), nullable=False)
-    calificaciones = db.Column(db.String(100), nullable=False)
-    alumno_id = db.Column(db.Integer, db.ForeignKey('alumno.id'), nullable=False)
-
-    @property
-    def lista_calificaciones(self):
-        return [float(x) for x in self.calificaciones.split(',') if x.strip()]
-
-# Migración de base de datos
-with app.app_context():
-    db.drop_all()  # Eliminar tablas existentes
-    db.create_all()  # Crear nuevas tablas
-    
-    # Crear cursos por defecto
-    cursos_default = ['1ro C', '2do C']
-    for nombre_curso in cursos_default:
-        curso = Curso(nombre=nombre_curso)
-        db.session.add(curso)
-    db.session.commit()
-
-# Clase para generar PDFs
-class PDF(FPDF):
-    def header(self):
-        # Logo en la esquina superior izquierda
         try:
-            logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'logo.png')
-            if os.path.exists(logo_path):
-                self.image(logo_path, x=10, y=8, w=30)  # Logo más pequeño a la izquierda
-            else:
-                print(f"Logo no encontrado en: {logo_path}")
-        except Exception as e:
-            print(f"Error al cargar el logo: {e}")
-            import traceback
-            print(traceback.format_exc())
-        
-        # Texto del membrete al lado del logo
-        self.set_font('Arial', 'B', 15)
-        self.set_xy(45, 15)  # Posición al lado del logo
-        self.cell(0, 10, 'CEIA Amigos del Padre Hurtado - La Serena', 0, 1, 'L')
-        self.ln(20)
-
-    def create_grade_cell(self, w, h, txt, border=1):
-        # Método auxiliar para crear celdas de notas con borde completo
-        self.cell(w, h, txt, border, 0, 'C')
-
-    def footer(self):
-        self.set_y(-30)
-        self.set_font('Arial', '', 12)
-        self.cell(0, 10, '_'*40, 0, 1, 'C')
-        self.cell(0, 10, 'Jefe de UTP', 0, 1, 'C')
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
-
-@app.route('/')
+            locale.setlocale(locale.LC_TIME, 'es_CL.UTF-8')
+        except:
+            print("No se pudo configurar el idioma español para las fechas")
+
+def crear_app(config=None):
+    """Crea y configura la aplicación Flask.
+
+    Aplica las migraciones pendientes antes de devolverla; si el esquema ya
+    está al día, eso es una sola consulta. ``config`` permite reemplazar
+    valores, por ejemplo la URI de la base de datos en pruebas.
+    """
+    configurar_locale()
+
+    # Configuración de la aplicación Flask
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'clave-secreta-123'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///notas.db'  # DATABASE_URL la reemplaza (ver base_datos.py)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['PDF_CACHE_DIR'] = os.path.join(app.instance_path, 'cache_pdf')
+    app.config['PDF_CACHE_MAX_BYTES'] = 200 * 1024 * 1024  # 200 MB
+    app.config['PDF_CACHE_MAX_EDAD'] = 30 * 24 * 3600  # 30 días
+    app.config['PDF_CACHE_PURGA'] = 300  # Segundos máximos entre revisiones del directorio de la caché
+    app.config['PDF_PROCESOS'] = None  # Procesos para generar PDFs en lote (None = núcleos de CPU)
+    app.config['PDF_ARCHIVO_DIR'] = None  # Ej: 'static/pdfs' para guardar una copia de cada PDF
+    # Variables de entorno NOTAS_<CLAVE> (valores JSON), p. ej. NOTAS_PDF_PROCESOS=2;
+    # gunicorn.conf.py las usa para repartir los núcleos entre los workers
+    app.config.from_prefixed_env('NOTAS')
+    if config:
+        app.config.update(config)
+
+    base_datos.init_app(app)
+    admision.init_app(app)
+    cache_paginas.init_app(app)
+    cache_pdf.init_app(app)
+    cola_trabajos.init_app(app)
+    metricas_app.init_app(app)
+    app.register_blueprint(bp)
+
+    migraciones.actualizar(app)
+    return app
+
+_app = None
+
+def __getattr__(nombre):
+    # Compatibilidad con `gunicorn app:app` y `from app import app`: la
+    # aplicación se crea recién cuando alguien la pide
+    global _app
+    if nombre == 'app':
+        if _app is None:
+            _app = crear_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+def _pagina(consulta, claves, descendente=False):
+    # Parámetros comunes de los listados: despues/antes (cursores) y por_pagina
+    return paginacion.paginar(consulta, claves,
+                              despues=request.args.get('despues'),
+                              antes=request.args.get('antes'),
+                              descendente=descendente,
+                              cantidad=paginacion.por_pagina(request.args.get('por_pagina')))
+
+@bp.route('/')
+@cache_paginas.cachear
 def index():
-    cursos = Curso.query.order_by(Curso.nombre).all()
-    return render_template('index.html', cursos=cursos)
+    q = request.args.get('q', '').strip()
+    # Cantidad de alumnos y promedio salen del resumen, sin cargar los alumnos
+    consulta = db.session.query(Curso,
+                                db.func.coalesce(PromedioCurso.cantidad_alumnos, 0),
+                                db.func.coalesce(PromedioCurso.promedio, 0))\
+                         .outerjoin(PromedioCurso, PromedioCurso.curso_id == Curso.id)
+    if q:
+        consulta = consulta.filter(Curso.nombre.contains(q, autoescape=True))
+    cursos = _pagina(consulta, [Curso.nombre, Curso.id])
+    return render_template('index.html', cursos=cursos, q=q)
 
-@app.route('/administrar_cursos', methods=['GET', 'POST'])
+@bp.route('/administrar_cursos', methods=['GET', 'POST'])
+@cache_paginas.cachear
 def administrar_cursos():
     if request.method == 'POST':
         nombre = request.form.get('nombre')
@@ -132,7 +136,7 @@ def administrar_cursos():
     cursos = Curso.query.order_by(Curso.nombre).all()
     return render_template('administrar_cursos.html', cursos=cursos)
 
-@app.route('/editar_curso/<int:curso_id>', methods=['GET', 'POST'])
+@bp.route('/editar_curso/<int:curso_id>', methods=['GET', 'POST'])
 def editar_curso(curso_id):
     curso = Curso.query.get_or_404(curso_id)
     if request.method == 'POST':
@@ -142,25 +146,47 @@ def editar_curso(curso_id):
                 curso.nombre = nombre
                 db.session.commit()
                 flash('Curso actualizado exitosamente', 'success')
-                return redirect(url_for('administrar_cursos'))
+                return redirect(url_for('web.administrar_cursos'))
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al actualizar curso: {str(e)}', 'error')
     return render_template('editar_curso.html', curso=curso)
 
-@app.route('/eliminar_curso/<int:curso_id>')
+@bp.route('/eliminar_curso/<int:curso_id>')
 def eliminar_curso(curso_id):
     curso = Curso.query.get_or_404(curso_id)
     try:
+        promedios.quitar_curso(curso_id)
         db.session.delete(curso)
         db.session.commit()
         flash('Curso eliminado exitosamente', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error al eliminar curso: {str(e)}', 'error')
-    return redirect(url_for('administrar_cursos'))
+    return redirect(url_for('web.administrar_cursos'))
+
+@bp.route('/buscar')
+def buscar():
+    q = request.args.get('q', '').strip()
+    resultados = busqueda.buscar_alumnos(q) if q else []
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify(resultados=[{
+            'alumno_id': alumno.id,
+            'nombre': alumno.nombre_completo,
+            'numero_lista': alumno.numero_lista,
+            'curso_id': alumno.curso_id,
+            'curso': nombre_curso,
+        } for alumno, nombre_curso in resultados])
+    return render_template('buscar.html', q=q, resultados=resultados)
 
-@app.route('/administrar_alumnos/<int:curso_id>', methods=['GET', 'POST'])
+# Columnas de orden de la lista de alumnos; el id desempata para la paginación
+ORDEN_ALUMNOS = {
+    'numero': [Alumno.numero_lista, Alumno.id],
+    'nombre': [Alumno.nombre_completo, Alumno.id],
+}
+
+@bp.route('/administrar_alumnos/<int:curso_id>', methods=['GET', 'POST'])
+@cache_paginas.cachear
 def administrar_alumnos(curso_id):
     curso = Curso.query.get_or_404(curso_id)
     if request.method == 'POST':
@@ -181,16 +207,30 @@ def administrar_alumnos(curso_id):
                     numero_lista=nuevo_numero
                 )
                 db.session.add(alumno)
+                db.session.flush()
+                promedios.registrar_alumnos(curso_id, [alumno.id])
                 db.session.commit()
                 flash('Alumno agregado exitosamente', 'success')
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al agregar alumno: {str(e)}', 'error')
     
-    alumnos = Alumno.query.filter_by(curso_id=curso_id).order_by(Alumno.numero_lista).all()
-    return render_template('administrar_alumnos.html', curso=curso, alumnos=alumnos)
+    q = request.args.get('q', '').strip()
+    orden = request.args.get('orden', 'numero')
+    if orden not in ORDEN_ALUMNOS:
+        orden = 'numero'
+    direccion = 'desc' if request.args.get('dir') == 'desc' else 'asc'
 
-@app.route('/editar_alumno/<int:alumno_id>', methods=['GET', 'POST'])
+    consulta = db.session.query(Alumno, db.func.coalesce(PromedioAlumno.promedio, 0))\
+                         .outerjoin(PromedioAlumno, PromedioAlumno.alumno_id == Alumno.id)\
+                         .filter(Alumno.curso_id == curso_id)
+    if q:
+        consulta = consulta.filter(Alumno.nombre_completo.contains(q, autoescape=True))
+    alumnos = _pagina(consulta, ORDEN_ALUMNOS[orden], descendente=direccion == 'desc')
+    return render_template('administrar_alumnos.html', curso=curso, alumnos=alumnos,
+                           q=q, orden=orden, direccion=direccion)
+
+@bp.route('/editar_alumno/<int:alumno_id>', methods=['GET', 'POST'])
 def editar_alumno(alumno_id):
     alumno = Alumno.query.get_or_404(alumno_id)
     if request.method == 'POST':
@@ -202,26 +242,27 @@ def editar_alumno(alumno_id):
                 alumno.numero_lista = int(numero_lista)
                 db.session.commit()
                 flash('Alumno actualizado exitosamente', 'success')
-                return redirect(url_for('administrar_alumnos', curso_id=alumno.curso_id))
+                return redirect(url_for('web.administrar_alumnos', curso_id=alumno.curso_id))
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al actualizar alumno: {str(e)}', 'error')
     return render_template('editar_alumno.html', alumno=alumno)
 
-@app.route('/eliminar_alumno/<int:alumno_id>')
+@bp.route('/eliminar_alumno/<int:alumno_id>')
 def eliminar_alumno(alumno_id):
     alumno = Alumno.query.get_or_404(alumno_id)
     curso_id = alumno.curso_id
     try:
+        promedios.quitar_alumno(alumno)
         db.session.delete(alumno)
         db.session.commit()
         flash('Alumno eliminado exitosamente', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error al eliminar alumno: {str(e)}', 'error')
-    return redirect(url_for('administrar_alumnos', curso_id=curso_id))
+    return redirect(url_for('web.administrar_alumnos', curso_id=curso_id))
 
-@app.route('/importar_alumnos/<int:curso_id>', methods=['GET', 'POST'])
+@bp.route('/importar_alumnos/<int:curso_id>', methods=['GET', 'POST'])
 def importar_alumnos(curso_id):
     curso = Curso.query.get_or_404(curso_id)
     if request.method == 'POST':
@@ -236,56 +277,40 @@ def importar_alumnos(curso_id):
         
         if archivo:
             try:
-                contenido = archivo.read().decode('utf-8')
-                lineas = contenido.strip().split('\n')
-                for i, linea in enumerate(lineas, 1):
-                    nombre = linea.strip()
-                    if nombre:
-                        alumno = Alumno(
-                            nombre_completo=nombre,
-                            curso_id=curso_id,
-                            numero_lista=i
-                        )
-                        db.session.add(alumno)
-                
+                es_csv = archivo.filename.lower().endswith('.csv')
+                reporte = importacion.importar_alumnos(archivo.stream, curso, es_csv=es_csv)
                 db.session.commit()
-                flash(f'Se importaron {len(lineas)} alumnos exitosamente', 'success')
-                return redirect(url_for('administrar_alumnos', curso_id=curso_id))
+                flash(f'Se importaron {reporte.agregados} alumnos exitosamente', 'success')
+                return render_template('importar_alumnos.html', curso=curso, reporte=reporte)
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al importar alumnos: {str(e)}', 'error')
     
     return render_template('importar_alumnos.html', curso=curso)
 
-@app.route('/editar_notas/<int:alumno_id>')
+@bp.route('/editar_notas/<int:alumno_id>')
+@cache_paginas.cachear
 def editar_notas(alumno_id):
     alumno = Alumno.query.get_or_404(alumno_id)
-    notas_por_asignatura = {}
-    for asignatura in ASIGNATURAS:
-        nota = Nota.query.filter_by(alumno_id=alumno_id, asignatura=asignatura).first()
-        if nota:
-            notas_por_asignatura[asignatura] = nota.lista_calificaciones
-        else:
-            notas_por_asignatura[asignatura] = []
+    notas_alumno = cargar_notas(alumno_id=alumno_id)
+    notas_por_asignatura = {asignatura: notas_alumno.get((alumno_id, asignatura), [])
+                            for asignatura in ASIGNATURAS}
     
     return render_template('editar_notas.html', alumno=alumno, asignaturas=ASIGNATURAS, notas=notas_por_asignatura)
 
-@app.route('/actualizar_nota/<int:alumno_id>/<asignatura>', methods=['POST'])
+@bp.route('/actualizar_nota/<int:alumno_id>/<asignatura>', methods=['POST'])
 def actualizar_nota(alumno_id, asignatura):
+    alumno = Alumno.query.get_or_404(alumno_id)
     try:
         notas_str = request.form.get('notas')
         if notas_str:
             notas = [float(n.strip()) for n in notas_str.split(',') if n.strip()]
             nota = Nota.query.filter_by(alumno_id=alumno_id, asignatura=asignatura).first()
-            if nota:
-                nota.calificaciones = ','.join(str(n) for n in notas)
-            else:
-                nota = Nota(
-                    asignatura=asignatura,
-                    calificaciones=','.join(str(n) for n in notas),
-                    alumno_id=alumno_id
-                )
+            if not nota:
+                nota = Nota(asignatura=asignatura, alumno_id=alumno_id)
                 db.session.add(nota)
+            nota.asignar_calificaciones(notas)
+            promedios.actualizar_asignatura(alumno, asignatura)
             
             db.session.commit()
             flash('Notas actualizadas exitosamente', 'success')
@@ -294,6 +319,7 @@ def actualizar_nota(alumno_id, asignatura):
             nota = Nota.query.filter_by(alumno_id=alumno_id, asignatura=asignatura).first()
             if nota:
                 db.session.delete(nota)
+                promedios.actualizar_asignatura(alumno, asignatura)
                 db.session.commit()
             flash('Notas eliminadas', 'success')
     except ValueError:
@@ -302,195 +328,353 @@ def actualizar_nota(alumno_id, asignatura):
         db.session.rollback()
         flash(f'Error al actualizar notas: {str(e)}', 'error')
     
-    return redirect(url_for('editar_notas', alumno_id=alumno_id))
+    return redirect(url_for('web.editar_notas', alumno_id=alumno_id))
+
+def _resumen_json(resumen):
+    # Claves de texto para JSON: {alumno_id: {promedio, asignaturas}}
+    alumnos = {str(alumno_id): {'promedio': valor, 'asignaturas': {}}
+               for alumno_id, valor in resumen['alumnos'].items()}
+    for (alumno_id, asignatura), valor in resumen['asignaturas'].items():
+        alumnos[str(alumno_id)]['asignaturas'][asignatura] = valor
+    return {'curso': resumen['curso'], 'alumnos': alumnos}
+
+@bp.route('/planilla_notas/<int:curso_id>', methods=['GET', 'POST'])
+def planilla_notas(curso_id):
+    """Planilla con las notas de todo el curso.
+
+    Por POST acepta un lote de cambios como JSON, CSV (cuerpo ``text/csv`` o
+    archivo ``archivo``) o el formulario de la planilla, y lo aplica en una
+    sola transacción. Los clientes JSON y CSV reciben los promedios
+    recalculados del curso.
+    """
+    curso = Curso.query.get_or_404(curso_id)
+    if request.method == 'POST':
+        archivo = request.files.get('archivo')
+        formulario = not (request.is_json or request.mimetype == 'text/csv' or
+                          request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json')
+        try:
+            if request.is_json:
+                cambios = planilla.cambios_desde_json(request.get_json())
+            elif request.mimetype == 'text/csv' or archivo:
+                contenido = archivo.read() if archivo else request.get_data()
+                texto = contenido.decode(importacion.detectar_codificacion(contenido), errors='replace')
+                cambios = planilla.cambios_desde_csv(texto.lstrip('\ufeff').splitlines(), curso_id)
+            else:
+                cambios = planilla.cambios_desde_formulario(request.form)
+            modificadas = planilla.aplicar_cambios(curso_id, cambios)
+            db.session.commit()
+        except planilla.ErrorPlanilla as e:
+            db.session.rollback()
+            if formulario:
+                flash(str(e), 'error')
+                return redirect(url_for('web.planilla_notas', curso_id=curso_id))
+            return jsonify(error=str(e)), 400
+
+        if formulario:
+            flash(f'Se actualizaron {modificadas} asignaturas', 'success')
+            return redirect(url_for('web.planilla_notas', curso_id=curso_id))
+        return jsonify(modificadas=modificadas,
+                       promedios=_resumen_json(promedios.resumen_curso(curso_id)))
+
+    alumnos = Alumno.query.filter_by(curso_id=curso_id).order_by(Alumno.numero_lista).all()
+    resumen = promedios.resumen_curso(curso_id)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        notas = cargar_notas(curso_id=curso_id)
+        return jsonify(alumnos=[{
+            'alumno_id': alumno.id,
+            'numero_lista': alumno.numero_lista,
+            'nombre': alumno.nombre_completo,
+            'notas': {asignatura: notas.get((alumno.id, asignatura), []) for asignatura in ASIGNATURAS},
+        } for alumno in alumnos], promedios=_resumen_json(resumen))
+    return render_template('planilla_notas.html', curso=curso, alumnos=alumnos,
+                           asignaturas=ASIGNATURAS, notas=cargar_notas(curso_id=curso_id),
+                           resumen=resumen)
+
+# Documentos generados: contenido en memoria (o un generador de bytes para los
+# que se envían por partes), listo para responder o guardar
+Documento = namedtuple('Documento', ['contenido', 'mimetype', 'nombre', 'etag'])
+
+def _archivar(documento):
+    # Archivo opcional de cada documento entregado, como se hacía antes en static/pdfs
+    if current_app.config['PDF_ARCHIVO_DIR']:
+        os.makedirs(current_app.config['PDF_ARCHIVO_DIR'], exist_ok=True)
+        with open(os.path.join(current_app.config['PDF_ARCHIVO_DIR'], documento.nombre), 'wb') as archivo:
+            archivo.write(documento.contenido)
+
+def _enviar(documento):
+    _archivar(documento)
+    respuesta = send_file(io.BytesIO(documento.contenido), mimetype=documento.mimetype,
+                          as_attachment=True, download_name=documento.nombre,
+                          etag=documento.etag, conditional=True, max_age=0)
+    return _privada(respuesta)
+
+def _privada(respuesta):
+    # Las notas son datos personales: no deben guardarse en cachés compartidas
+    respuesta.cache_control.public = False
+    respuesta.cache_control.private = True
+    respuesta.cache_control.must_revalidate = True
+    return respuesta
+
+def _pdf(tipo, datos, render, filename):
+    # Toma el PDF de la caché y sólo lo genera si los datos cambiaron
+    clave = reportes.clave_documento(tipo, datos)
+    contenido = cache_pdf.obtener(clave)
+    metricas.PDF_CACHE.inc(tipo=tipo, resultado='acierto' if contenido is not None else 'fallo')
+    if contenido is None:
+        with metricas.PDF_RENDER.medir(tipo=tipo):
+            contenido = reportes.renderizar(render, datos, current_app.config['PDF_PROCESOS'])
+        cache_pdf.guardar(clave, contenido)
+    return Documento(contenido, 'application/pdf', filename, clave)
+
+def _iterar_pdfs_en_cache(tipo, lista_datos, render, progreso=None):
+    """Genera ``(clave, contenido)`` por documento, en orden y apenas cada uno
+    está listo; los que no están en la caché se generan en paralelo en el
+    pool de procesos.
+
+    Cada PDF de la caché se lee recién cuando le toca, así que en memoria
+    hay un documento a la vez y no el lote completo.
+    """
+    procesos = current_app.config['PDF_PROCESOS']
+    claves = [reportes.clave_documento(tipo, datos) for datos in lista_datos]
+    # Sólo se revisa qué PDFs existen, para encargar desde ya los que faltan
+    faltantes = {i for i, clave in enumerate(claves) if not cache_pdf.contiene(clave)}
+    metricas.PDF_CACHE.inc(len(claves) - len(faltantes), tipo=tipo, resultado='acierto')
+    metricas.PDF_CACHE.inc(len(faltantes), tipo=tipo, resultado='fallo')
+    generados = reportes.renderizar_en_flujo(render, [lista_datos[i] for i in sorted(faltantes)],
+                                             procesos=procesos)
+    for i, clave in enumerate(claves):
+        if i in faltantes:
+            contenido = next(generados)
+            cache_pdf.guardar(clave, contenido)
+        else:
+            contenido = cache_pdf.obtener(clave)
+            if contenido is None:
+                # Se expulsó de la caché después de revisarla
+                contenido = reportes.renderizar(render, lista_datos[i], procesos)
+                cache_pdf.guardar(clave, contenido)
+        if progreso:
+            progreso(i + 1, len(claves))
+        yield clave, contenido
+
+def _pdfs_en_cache(tipo, lista_datos, render, progreso=None):
+    """Como ``_iterar_pdfs_en_cache``, pero devuelve la lista completa."""
+    # Tiempo del lote completo, no por documento
+    with metricas.PDF_RENDER.medir(tipo=f'{tipo}_lote'):
+        return list(_iterar_pdfs_en_cache(tipo, lista_datos, render, progreso))
+
+def _documento_informe_curso(curso_id, progreso=None):
+    curso = db.get_or_404(Curso, curso_id)
+    datos = reportes.datos_informe_curso(curso)
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'notas_{curso.nombre.replace(" ", "_")}_{fecha}.pdf'
+    return _pdf('informe_curso', datos, reportes.render_informe_curso, filename)
+
+def _documento_anexo_estadisticas(curso_id, progreso=None):
+    # estadisticas importa NumPy, que por sí solo tarda más que el resto de la
+    # aplicación: se carga recién al usarlo para no alargar el arranque
+    import estadisticas
+    curso = db.get_or_404(Curso, curso_id)
+    datos = estadisticas.estadisticas_curso(curso)
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'estadisticas_{curso.nombre.replace(" ", "_")}_{fecha}.pdf'
+    return _pdf('anexo_estadisticas', datos, reportes.render_anexo_estadisticas, filename)
+
+def _documento_certificado(alumno_id, progreso=None):
+    alumno = db.get_or_404(Alumno, alumno_id)
+    datos = reportes.datos_certificado(alumno)
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'certificado_{alumno.nombre_completo.replace(" ", "_")}_{fecha}.pdf'
+    return _pdf('certificado', datos, reportes.render_certificado, filename)
+
+# Un ZIP con un PDF por alumno o un solo PDF con todos los certificados
+FORMATOS_CERTIFICADOS = ('zip', 'pdf')
+
+def _documento_certificados_curso(curso_id, formato, progreso=None):
+    curso = db.get_or_404(Curso, curso_id)
+    lista = reportes.datos_certificados_curso(curso)
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+    nombre_base = f'certificados_{curso.nombre.replace(" ", "_")}_{fecha}'
+
+    if formato == 'pdf':
+        # Un solo documento: se genera completo en un proceso del pool
+        return _pdf('certificados_curso', lista, reportes.render_certificados, f'{nombre_base}.pdf')
+
+    documentos = _pdfs_en_cache('certificado', lista, reportes.render_certificado, progreso)
+    buffer = io.BytesIO()
+    # Los PDFs ya vienen comprimidos, no vale la pena volver a comprimirlos
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for i, (datos, (clave, contenido)) in enumerate(zip(lista, documentos), 1):
+            archivo_zip.writestr(f'{i:02d}_certificado_{datos["nombre"].replace(" ", "_")}.pdf', contenido)
+    etag = reportes.clave_documento('certificados_zip', [clave for clave, _ in documentos])
+    return Documento(buffer.getvalue(), 'application/zip', f'{nombre_base}.zip', etag)
+
+def _documento_colegio(progreso=None):
+    """ZIP con el informe de notas de cada curso del colegio.
+
+    El contenido es un generador: cada PDF se agrega al ZIP apenas está
+    listo, así que la descarga empieza con el primer curso y el archivo
+    completo nunca está en memoria.
+    """
+    lista = reportes.datos_informes_colegio()
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+    nombres = [f'{i:02d}_notas_{datos["curso"].replace(" ", "_")}.pdf' for i, datos in enumerate(lista, 1)]
+    etag = reportes.clave_documento('informes_colegio',
+                                    [reportes.clave_documento('informe_curso', datos) for datos in lista])
+    documentos = _iterar_pdfs_en_cache('informe_curso', lista, reportes.render_informe_curso, progreso)
+    contenido = archivo_zip.zip_en_flujo((nombre, pdf) for nombre, (_, pdf) in zip(nombres, documentos))
+    return Documento(contenido, 'application/zip', f'informes_colegio_{fecha}.zip', etag)
 
-@app.route('/exportar_curso_pdf/<int:curso_id>')
+def _enviar_en_flujo(documento):
+    # Como _enviar, para documentos cuyo contenido es un generador de bytes
+    respuesta = Response(stream_with_context(documento.contenido), mimetype=documento.mimetype)
+    respuesta.headers.set('Content-Disposition', 'attachment', filename=documento.nombre)
+    respuesta.cache_control.private = True
+    respuesta.cache_control.must_revalidate = True
+    respuesta.cache_control.max_age = 0
+    if documento.etag is None:
+        return respuesta
+    # Con un ETag vigente se responde 304 sin generar el documento
+    respuesta.set_etag(documento.etag)
+    return respuesta.make_conditional(request)
+
+def _documento_planilla(curso_id, formato, progreso=None):
+    curso = db.get_or_404(Curso, curso_id)
+    generar, mimetype = exportacion.FORMATOS[formato]
+    fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'notas_{curso.nombre.replace(" ", "_")}_{fecha}.{formato}'
+    return Documento(generar(curso), mimetype, filename, None)
+
+def _encolar(tipo, funcion, *args):
+    # ?diferido=1: el documento se genera en segundo plano y se consulta su estado
+    trabajo_id = cola_trabajos.encolar(tipo, funcion, *args)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify(id=trabajo_id, estado=url_for('web.estado_trabajo', trabajo_id=trabajo_id)), 202
+    return redirect(url_for('web.estado_trabajo', trabajo_id=trabajo_id))
+
+@bp.route('/exportar_curso_pdf/<int:curso_id>')
+@admision.limitar
 def exportar_curso_pdf(curso_id):
+    Curso.query.get_or_404(curso_id)
+    if request.args.get('diferido'):
+        return _encolar('informe_curso', _documento_informe_curso, curso_id)
     try:
-        curso = Curso.query.get_or_404(curso_id)
-        alumnos = Alumno.query.filter_by(curso_id=curso_id)\
-                             .order_by(Alumno.numero_lista)\
-                             .all()
-        
-        pdf = PDF()
-        pdf.add_page()
-        
-        # Establecer márgenes uniformes
-        margin = 20
-        pdf.set_margins(margin, margin, margin)
-        pdf.set_auto_page_break(True, margin)
-        
-        pdf.ln(20)  # Espacio después del membrete
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(0, 10, f'Informe de Notas - {curso.nombre}', 0, 1, 'C')
-        pdf.ln(10)
-        
-        # Configuración de la tabla
-        page_width = pdf.w - 2*margin
-        
-        # Distribución del ancho de columnas
-        col_width_numero = page_width * 0.05  # 5% para número de lista
-        col_width_nombre = page_width * 0.25  # 25% para nombre
-        col_width_nota = page_width * 0.07    # 7% para cada nota (total 42% para 6 notas)
-        col_width_promedio = page_width * 0.08  # 8% para promedio
-        
-        # Altura de fila uniforme
-        row_height = 7
-        
-        # Encabezados
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(col_width_numero, row_height, 'N°', 1, 0, 'C')
-        pdf.cell(col_width_nombre, row_height, 'Nombre', 1, 0, 'C')
-        
-        for asignatura in ASIGNATURAS:
-            pdf.cell(col_width_nota, row_height, asignatura[:4], 1, 0, 'C')
-        
-        pdf.cell(col_width_promedio, row_height, 'Prom.', 1, 1, 'C')
-        
-        # Datos de alumnos
-        pdf.set_font('Arial', '', 10)
-        
-        promedios_curso = []
-        for alumno in alumnos:
-            # Número de lista
-            pdf.cell(col_width_numero, row_height, str(alumno.numero_lista), 1, 0, 'C')
-            
-            # Nombre del alumno
-            pdf.cell(col_width_nombre, row_height, alumno.nombre_completo, 1, 0, 'L')
-            
-            # Promedios por asignatura
-            promedios_alumno = []
-            for asignatura in ASIGNATURAS:
-                promedio = alumno.obtener_promedio_asignatura(asignatura)
-                promedios_alumno.append(promedio)
-                pdf.cell(col_width_nota, row_height, f'{promedio:.1f}', 1, 0, 'C')
-            
-            # Promedio del alumno
-            promedio_alumno = sum(promedios_alumno) / len(promedios_alumno) if promedios_alumno else 0
-            promedios_curso.append(promedio_alumno)
-            pdf.cell(col_width_promedio, row_height, f'{promedio_alumno:.1f}', 1, 1, 'C')
-        
-        # Promedio del curso
-        pdf.ln(5)
-        promedio_curso = sum(promedios_curso) / len(promedios_curso) if promedios_curso else 0
-        pdf.set_font('Arial', 'B', 11)
-        pdf.cell(0, 10, f'Promedio del Curso: {promedio_curso:.1f}', 0, 1, 'C')
-        
-        # Guardar PDF
-        os.makedirs('static/pdfs', exist_ok=True)
-        fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'notas_{curso.nombre.replace(" ", "_")}_{fecha}.pdf'
-        pdf_path = os.path.join('static', 'pdfs', filename)
-        pdf.output(pdf_path)
-        
-        return send_file(pdf_path, as_attachment=True)
+        return _enviar(_documento_informe_curso(curso_id))
         
     except Exception as e:
         print(f"Error al generar PDF: {e}")
         flash('Error al generar el PDF', 'error')
-        return redirect(url_for('administrar_alumnos', curso_id=curso_id))
+        return redirect(url_for('web.administrar_alumnos', curso_id=curso_id))
+
+@bp.route('/exportar_curso/<int:curso_id>/<formato>')
+def exportar_curso(curso_id, formato):
+    """Planilla de notas y promedios del curso en CSV, XLSX o JSON, escrita
+    fila por fila mientras se envía."""
+    if formato == 'pdf':
+        return redirect(url_for('web.exportar_curso_pdf', curso_id=curso_id))
+    if formato not in exportacion.FORMATOS:
+        abort(404)
+    return _enviar_en_flujo(_documento_planilla(curso_id, formato))
+
+@bp.route('/exportar_colegio')
+@admision.limitar
+def exportar_colegio():
+    """Informes de notas de todos los cursos en un ZIP que se envía a medida
+    que se generan; ``?diferido=1`` lo genera en segundo plano."""
+    if request.args.get('diferido'):
+        return _encolar('informes_colegio', _documento_colegio)
+    return _enviar_en_flujo(_documento_colegio())
+
+@bp.cli.command('exportar-colegio')
+@click.argument('salida', type=click.Path(dir_okay=False, writable=True))
+def exportar_colegio_cli(salida):
+    """Genera el ZIP con los informes de notas de todos los cursos."""
+    def progreso(hechos, total):
+        click.echo(f'\r{hechos}/{total} cursos', nl=False, err=True)
+
+    documento = _documento_colegio(progreso)
+    with open(salida, 'wb') as archivo:
+        for bloque in documento.contenido:
+            archivo.write(bloque)
+    click.echo(f'\nArchivo generado: {salida}', err=True)
+
+@bp.route('/estadisticas_curso/<int:curso_id>')
+@admision.limitar
+def estadisticas_curso(curso_id):
+    """Estadísticas del curso en JSON, o el anexo PDF con ``?formato=pdf``."""
+    import estadisticas
+    curso = Curso.query.get_or_404(curso_id)
+    if request.args.get('formato') == 'pdf':
+        return _enviar(_documento_anexo_estadisticas(curso_id))
+    return jsonify(estadisticas.estadisticas_curso(curso))
+
+@bp.route('/estadisticas')
+def estadisticas_colegio():
+    """Estadísticas de todos los cursos; ``?alumnos=1`` incluye el detalle por alumno."""
+    import estadisticas
+    return jsonify(estadisticas.estadisticas_colegio(incluir_alumnos=bool(request.args.get('alumnos'))))
 
-@app.route('/certificado_alumno/<int:alumno_id>')
+@bp.route('/certificado_alumno/<int:alumno_id>')
+@admision.limitar
 def certificado_alumno(alumno_id):
+    alumno = Alumno.query.get_or_404(alumno_id)
+    if request.args.get('diferido'):
+        return _encolar('certificado', _documento_certificado, alumno_id)
     try:
-        alumno = Alumno.query.get_or_404(alumno_id)
-        
-        pdf = PDF()
-        pdf.add_page()
-        
-        # Establecer márgenes uniformes
-        margin = 20
-        pdf.set_margins(margin, margin, margin)
-        pdf.set_auto_page_break(True, margin)
-        
-        pdf.ln(20)  # Espacio después del membrete
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(0, 10, 'CERTIFICADO DE NOTAS', 0, 1, 'C')
-        pdf.ln(10)
-        
-        # Información del alumno
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(0, 10, f'Certifico que el alumno(a):', 0, 1)
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, f'{alumno.nombre_completo}', 0, 1)
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(0, 10, f'Del curso {alumno.curso_rel.nombre}, tiene las siguientes calificaciones:', 0, 1)
-        pdf.ln(10)
-        
-        # Configuración de la tabla
-        page_width = pdf.w - 2*margin
-        max_notas = 7  # N1 a N7
-        
-        # Calcular anchos de columna basados en el espacio disponible
-        col_width_asignatura = page_width * 0.25  # 25% del espacio disponible
-        col_width_nota = (page_width * 0.65) / max_notas  # 65% distribuido entre las notas
-        col_width_promedio = page_width * 0.10  # 10% para el promedio
-        row_height = 7
-        
-        # Encabezados
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(col_width_asignatura, row_height, 'Asignatura', 1, 0, 'C')
-        
-        # Encabezados numerados para las notas
-        for i in range(max_notas):
-            pdf.cell(col_width_nota, row_height, f'N{i+1}', 1, 0, 'C')
-        
-        pdf.cell(col_width_promedio, row_height, 'Prom.', 1, 1, 'C')
-        
-        # Datos
-        pdf.set_font('Arial', '', 10)
-        promedios = []
-        
-        for asignatura in ASIGNATURAS:
-            notas = [n for n in alumno.notas if n.asignatura == asignatura]
-            promedio = alumno.obtener_promedio_asignatura(asignatura)
-            promedios.append(promedio)
-            
-            # Asignatura (alineada a la izquierda con un pequeño padding)
-            pdf.cell(col_width_asignatura, row_height, ' ' + asignatura, 1, 0, 'L')
-            
-            # Notas en celdas individuales
-            if notas:
-                notas_lista = notas[0].lista_calificaciones
-                # Rellenar celdas con notas o vacías
-                for i in range(max_notas):
-                    if i < len(notas_lista):
-                        pdf.cell(col_width_nota, row_height, f'{notas_lista[i]:.1f}', 1, 0, 'C')
-                    else:
-                        pdf.cell(col_width_nota, row_height, '', 1, 0, 'C')
-            else:
-                # Si no hay notas, crear celdas vacías
-                for _ in range(max_notas):
-                    pdf.cell(col_width_nota, row_height, '', 1, 0, 'C')
-            
-            # Promedio
-            pdf.cell(col_width_promedio, row_height, f'{promedio:.1f}', 1, 1, 'C')
-        
-        # Promedio final
-        pdf.ln(10)
-        promedio_final = sum(promedios) / len(promedios) if promedios else 0
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, f'Promedio Final: {promedio_final:.1f}', 0, 1, 'C')
-        
-        # Fecha
-        pdf.ln(10)
-        pdf.set_font('Arial', '', 10)
-        fecha_actual = datetime.now().strftime('%d de %B de %Y').capitalize()
-        pdf.cell(0, 10, f'La Serena, {fecha_actual}', 0, 1)
-        
-        # Guardar PDF
-        os.makedirs('static/pdfs', exist_ok=True)
-        fecha = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'certificado_{alumno.nombre_completo.replace(" ", "_")}_{fecha}.pdf'
-        pdf_path = os.path.join('static', 'pdfs', filename)
-        pdf.output(pdf_path)
-        
-        return send_file(pdf_path, as_attachment=True, download_name=filename)
+        return _enviar(_documento_certificado(alumno_id))
     
     except Exception as e:
         print(f"Error al generar certificado: {e}")
         flash('Error al generar el certificado', 'error')
-        return redirect(url_for('administrar_alumnos', curso_id=alumno.curso_id))
+        return redirect(url_for('web.administrar_alumnos', curso_id=alumno.curso_id))
+
+@bp.route('/certificados_curso/<int:curso_id>')
+@admision.limitar
+def certificados_curso(curso_id):
+    Curso.query.get_or_404(curso_id)
+    formato = request.args.get('formato', 'zip')
+    if formato not in FORMATOS_CERTIFICADOS:
+        abort(400, f'Formato no soportado: {formato}')
+    if request.args.get('diferido'):
+        return _encolar('certificados_curso', _documento_certificados_curso, curso_id, formato)
+    try:
+        return _enviar(_documento_certificados_curso(curso_id, formato))
+
+    except Exception as e:
+        print(f"Error al generar certificados: {e}")
+        flash('Error al generar los certificados', 'error')
+        return redirect(url_for('web.administrar_alumnos', curso_id=curso_id))
+
+@bp.route('/metrics')
+def metrics():
+    return Response(metricas.exponer(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/trabajos/<trabajo_id>')
+def estado_trabajo(trabajo_id):
+    trabajo = db.get_or_404(Trabajo, trabajo_id)
+    estado = trabajo.como_dict()
+    if cola_trabajos.abandonado(trabajo):
+        # Sólo lectura: la fila se corrige en la próxima revisión de la cola
+        estado.update(estado=trabajos.ERROR, mensaje=trabajos.MENSAJE_ABANDONADO)
+    if trabajo.estado == trabajos.TERMINADO:
+        estado['descarga'] = url_for('web.descargar_trabajo', trabajo_id=trabajo_id)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify(estado)
+    return render_template('trabajo.html', trabajo=estado)
+
+@bp.route('/trabajos/<trabajo_id>/descargar')
+def descargar_trabajo(trabajo_id):
+    trabajo = db.get_or_404(Trabajo, trabajo_id)
+    if trabajo.estado != trabajos.TERMINADO:
+        abort(409)
+    if current_app.config['PDF_ARCHIVO_DIR']:
+        os.makedirs(current_app.config['PDF_ARCHIVO_DIR'], exist_ok=True)
+        shutil.copyfile(trabajo.archivo, os.path.join(current_app.config['PDF_ARCHIVO_DIR'],
+                                                      trabajo.nombre_descarga))
+    # Desde el disco, sin cargar el archivo en memoria (el ZIP del colegio
+    # puede ser grande)
+    respuesta = send_file(trabajo.archivo, mimetype=trabajo.mimetype, as_attachment=True,
+                          download_name=trabajo.nombre_descarga, conditional=True, max_age=0)
+    return _privada(respuesta)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5004)
\ No newline at end of file
+    crear_app().run(debug=True, port=5004)
\ No newline at end of file
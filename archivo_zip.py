@@ -0,0 +1,55 @@
+# Escritura de archivos ZIP por partes
+#
+# zipfile puede escribir en un flujo que no admite seek (agrega un
+# descriptor de datos después de cada entrada). zip_en_flujo aprovecha eso:
+# escribe cada entrada en un búfer y entrega sus bytes apenas termina, así
+# que el archivo completo nunca está en memoria y la respuesta HTTP o el
+# archivo en disco empiezan a recibir datos con el primer documento.
+import io
+import zipfile
+
+class _Bufer(io.RawIOBase):
+    # Destino de zipfile que acumula lo escrito hasta que se vacía
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+def zip_en_flujo(entradas, compresion=zipfile.ZIP_STORED):
+    """Genera los bytes de un ZIP con las entradas ``(nombre, contenido)``.
+
+    Cada entrada se consume y se entrega antes de pedir la siguiente, así
+    que ``entradas`` puede ser un generador que produce los documentos a
+    medida que están listos. ``contenido`` puede ser ``bytes`` o un iterable
+    de bloques de bytes. Por omisión no se comprime: los PDFs ya vienen
+    comprimidos.
+    """
+    bufer = _Bufer()
+    with zipfile.ZipFile(bufer, 'w', compresion) as archivo:
+        for nombre, contenido in entradas:
+            if isinstance(contenido, bytes):
+                archivo.writestr(nombre, contenido)
+            else:
+                # Entrada que a su vez se genera por partes
+                with archivo.open(nombre, 'w') as destino:
+                    for bloque in contenido:
+                        destino.write(bloque)
+                        datos = bufer.vaciar()
+                        if datos:
+                            yield datos
+            datos = bufer.vaciar()
+            if datos:
+                yield datos
+    # Directorio central al cerrar el archivo
+    yield bufer.vaciar()
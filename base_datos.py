@@ -0,0 +1,100 @@
+# Configuración del motor de base de datos
+#
+# Por omisión la aplicación usa SQLite en instance/notas.db. Con SQLite cada
+# conexión nueva activa WAL (los lectores no esperan al que escribe), ajusta
+# synchronous, cache_size y mmap_size, y espera hasta DB_BUSY_TIMEOUT
+# segundos cuando otro worker tiene la base bloqueada en vez de fallar de
+# inmediato.
+#
+# La variable de entorno DATABASE_URL (o la opción del mismo nombre) permite
+# usar una base de datos de servidor, por ejemplo PostgreSQL; en ese caso no
+# se aplican los PRAGMA y el pool verifica las conexiones antes de usarlas.
+import functools
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from modelos import db
+
+def _es_sqlite(uri):
+    return uri.startswith('sqlite')
+
+def _en_memoria(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+def configurar(app):
+    """Completa la configuración del motor a partir de las opciones ``DB_*``
+    y ``SQLITE_*``. Se llama antes de ``db.init_app``."""
+    app.config.setdefault('DATABASE_URL', os.environ.get('DATABASE_URL'))
+    app.config.setdefault('DB_BUSY_TIMEOUT', 10)  # segundos
+    app.config.setdefault('DB_POOL_SIZE', 5)
+    app.config.setdefault('DB_MAX_OVERFLOW', 10)
+    app.config.setdefault('DB_POOL_RECYCLE', 3600)
+    app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')  # seguro con WAL
+    app.config.setdefault('SQLITE_CACHE_KB', 20 * 1024)
+    app.config.setdefault('SQLITE_MMAP_BYTES', 256 * 1024 * 1024)
+
+    if app.config['DATABASE_URL']:
+        uri = app.config['DATABASE_URL']
+        # Algunos proveedores entregan el esquema antiguo "postgres://"
+        if uri.startswith('postgres://'):
+            uri = 'postgresql://' + uri[len('postgres://'):]
+        app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    opciones = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if _es_sqlite(uri):
+        argumentos = opciones.setdefault('connect_args', {})
+        argumentos.setdefault('timeout', app.config['DB_BUSY_TIMEOUT'])
+        # Las conexiones del pool se comparten entre hilos de la cola de trabajos
+        argumentos.setdefault('check_same_thread', False)
+    else:
+        opciones.setdefault('pool_pre_ping', True)
+        opciones.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+    if not _en_memoria(uri):
+        opciones.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        opciones.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+
+def _pragmas(config, conexion_dbapi, registro):
+    cursor = conexion_dbapi.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        # Valor negativo: tamaño en KiB en lugar de páginas
+        cursor.execute(f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_KB'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_BYTES'])}")
+        cursor.execute('PRAGMA temp_store=MEMORY')
+    finally:
+        cursor.close()
+
+def init_app(app):
+    """Configura el motor, inicializa ``db`` y registra los PRAGMA de SQLite."""
+    configurar(app)
+    db.init_app(app)
+    if _es_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        with app.app_context():
+            event.listen(db.engine, 'connect', functools.partial(_pragmas, app.config))
+
+def _base_ocupada(error):
+    mensaje = str(error.orig).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+def reintentar_si_ocupada(intentos=3, espera=0.2):
+    """Reintenta la función si la base sigue bloqueada después del timeout.
+
+    Sólo sirve para funciones que abren y cierran su propia transacción,
+    porque antes de reintentar se hace rollback de la sesión.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            for intento in range(intentos):
+                try:
+                    return funcion(*args, **kwargs)
+                except OperationalError as e:
+                    db.session.rollback()
+                    if not _base_ocupada(e) or intento == intentos - 1:
+                        raise
+                    time.sleep(espera * 2 ** intento)
+        return envoltura
+    return decorador
@@ -0,0 +1,154 @@
+# Benchmark de las rutas principales con datos sintéticos
+#
+# Crea una base temporal con datos_sinteticos, mide cada ruta con el cliente
+# de pruebas de Flask y entrega los tiempos (ms) y la cantidad de consultas
+# SQL por solicitud en JSON. Con --comparar se muestra la diferencia contra
+# un resultado anterior para detectar regresiones entre versiones.
+#
+# Uso: python benchmark.py [--cursos 10] [--alumnos 40] [--notas 6]
+#                          [--repeticiones 20] [--salida resultado.json]
+#                          [--comparar anterior.json]
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import event
+from app import crear_app
+from modelos import db, ASIGNATURAS, Curso, Alumno
+import datos_sinteticos
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+def _resumen(tiempos, consultas):
+    ms = sorted(t * 1000 for t in tiempos)
+    return {
+        'repeticiones': len(ms),
+        'ms_min': round(ms[0], 3),
+        'ms_mediana': round(statistics.median(ms), 3),
+        'ms_p95': round(statistics.quantiles(ms, n=20)[18], 3) if len(ms) > 1 else round(ms[0], 3),
+        'ms_media': round(statistics.fmean(ms), 3),
+        'consultas_sql': statistics.median(consultas),
+    }
+
+def casos(curso_id, alumno_id, cursos_importacion, alumnos_curso):
+    """Devuelve ``{nombre: funcion(cliente, i)}`` con las rutas a medir."""
+    asignatura = ASIGNATURAS[0]
+    aleatorio = random.Random(7)
+
+    def importar(cliente, i):
+        lista = ''.join(f'{datos_sinteticos.nombre_aleatorio(aleatorio)}\n' for _ in range(40))
+        return cliente.post(f'/importar_alumnos/{cursos_importacion[i]}',
+                            data={'archivo': (io.BytesIO(lista.encode()), 'lista.txt')})
+
+    return {
+        'index': lambda c, i: c.get('/'),
+        'administrar_alumnos': lambda c, i: c.get(f'/administrar_alumnos/{curso_id}'),
+        'editar_notas': lambda c, i: c.get(f'/editar_notas/{alumno_id}'),
+        'actualizar_nota': lambda c, i: c.post(f'/actualizar_nota/{alumno_id}/{asignatura}',
+                                               data={'notas': f'5.{i % 10}, 6.0, 4.5'}),
+        'planilla_notas': lambda c, i: c.post(f'/planilla_notas/{curso_id}', json=[
+            {'alumno_id': a, 'asignatura': asignatura, 'notas': [4.0 + (i + a) % 30 / 10]}
+            for a in alumnos_curso]),
+        'exportar_curso_pdf': lambda c, i: c.get(f'/exportar_curso_pdf/{curso_id}'),
+        'certificado_alumno': lambda c, i: c.get(f'/certificado_alumno/{alumno_id}'),
+        'importar_alumnos': importar,
+        'buscar': lambda c, i: c.get('/buscar?q=gonz', headers={'Accept': 'application/json'}),
+    }
+
+def ejecutar(cursos, alumnos, notas, repeticiones, solo=None):
+    with tempfile.TemporaryDirectory() as directorio:
+        app = crear_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directorio, 'benchmark.db')}",
+            # Sin caché de PDFs ni de páginas: se mide la generación, no la lectura
+            'PDF_CACHE_DIR': None,
+            'CACHE_PAGINAS_MAX': 0,
+            'CACHE_PAGINAS_VERSION': os.path.join(directorio, 'version_datos'),
+            'TRABAJOS_DIR': os.path.join(directorio, 'trabajos'),
+        })
+        with app.app_context():
+            inicio = time.perf_counter()
+            curso_ids = datos_sinteticos.generar(cursos=cursos, alumnos=alumnos, notas=notas)
+            generacion = time.perf_counter() - inicio
+            # Un curso vacío por importación, más uno para calentar
+            importacion = datos_sinteticos.generar(cursos=repeticiones + 1, alumnos=0, notas=0,
+                                                   prefijo='Importación')
+            db.session.commit()
+            alumnos_curso = [alumno_id for (alumno_id,) in
+                             db.session.query(Alumno.id).filter_by(curso_id=curso_ids[0])
+                                                        .order_by(Alumno.numero_lista)]
+            total_cursos = Curso.query.count()
+
+        consultas = [0]
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute',
+                         lambda *args: consultas.__setitem__(0, consultas[0] + 1))
+
+        cliente = app.test_client()
+        resultados = {}
+        for nombre, funcion in casos(curso_ids[0], alumnos_curso[0], importacion, alumnos_curso).items():
+            if solo and nombre not in solo:
+                continue
+            funcion(cliente, repeticiones)  # calentar
+            tiempos, conteos = [], []
+            for i in range(repeticiones):
+                consultas[0] = 0
+                inicio = time.perf_counter()
+                respuesta = funcion(cliente, i)
+                tiempos.append(time.perf_counter() - inicio)
+                conteos.append(consultas[0])
+                if respuesta.status_code >= 400:
+                    raise RuntimeError(f'{nombre}: respuesta {respuesta.status_code}')
+            resultados[nombre] = _resumen(tiempos, conteos)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'datos': {'cursos': total_cursos, 'alumnos_por_curso': alumnos, 'notas_por_asignatura': notas,
+                  'generacion_s': round(generacion, 3)},
+        'resultados': resultados,
+    }
+
+def comparar(actual, anterior):
+    lineas = [f"{'ruta':<22}{'antes ms':>12}{'ahora ms':>12}{'cambio':>10}"]
+    for nombre, datos in actual['resultados'].items():
+        previo = anterior.get('resultados', {}).get(nombre)
+        if not previo:
+            continue
+        cambio = (datos['ms_mediana'] - previo['ms_mediana']) / previo['ms_mediana'] * 100
+        lineas.append(f"{nombre:<22}{previo['ms_mediana']:>12.2f}{datos['ms_mediana']:>12.2f}{cambio:>+9.1f}%")
+    return '\n'.join(lineas)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de las rutas principales')
+    parser.add_argument('--cursos', type=int, default=10)
+    parser.add_argument('--alumnos', type=int, default=40, help='Alumnos por curso')
+    parser.add_argument('--notas', type=int, default=6, help='Notas por asignatura')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--solo', nargs='*', help='Medir sólo estas rutas')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el resultado')
+    parser.add_argument('--comparar', help='Resultado JSON anterior')
+    args = parser.parse_args()
+
+    resultado = ejecutar(args.cursos, args.alumnos, args.notas, args.repeticiones, args.solo)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    print(texto)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            print(comparar(resultado, json.load(archivo)), file=sys.stderr)
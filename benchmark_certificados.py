@@ -0,0 +1,54 @@
+# Compara la generación de certificados alumno por alumno con la
+# generación en paralelo usada por /certificados_curso.
+#
+# Uso: python benchmark_certificados.py [alumnos] [procesos]
+import json
+import random
+import sys
+import time
+import reportes
+from modelos import ASIGNATURAS
+
+def datos_sinteticos(cantidad):
+    aleatorio = random.Random(42)
+    return [{
+        'nombre': f'Alumno de Prueba {i}',
+        'curso': '1ro C',
+        'asignaturas': [{
+            'nombre': asignatura,
+            'notas': notas,
+            'promedio': sum(notas) / len(notas),
+        } for asignatura in ASIGNATURAS
+          for notas in [[round(aleatorio.uniform(1, 7), 1) for _ in range(aleatorio.randint(1, 7))]]],
+        'promedio': 5.0,
+        'fecha': '18 de octubre de 2026',
+    } for i in range(cantidad)]
+
+def medir(funcion, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+if __name__ == '__main__':
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 45
+    procesos = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    lista = datos_sinteticos(cantidad)
+
+    # Calentar el pool para no medir el arranque de los procesos
+    reportes.renderizar_en_paralelo(reportes.render_certificado, lista[:1], procesos)
+
+    secuencial = medir(lambda: [reportes.render_certificado(datos) for datos in lista])
+    paralelo = medir(lambda: reportes.renderizar_en_paralelo(reportes.render_certificado, lista, procesos))
+    combinado = medir(lambda: reportes.render_certificados(lista))
+
+    print(json.dumps({
+        'alumnos': cantidad,
+        'procesos': reportes.procesos_pdf(),
+        'secuencial_s': round(secuencial, 4),
+        'paralelo_s': round(paralelo, 4),
+        'pdf_combinado_s': round(combinado, 4),
+        'aceleracion': round(secuencial / paralelo, 2),
+    }, indent=2))
@@ -0,0 +1,84 @@
+# Búsqueda de alumnos en todo el colegio
+#
+# En SQLite se usa el índice FTS5 ``alumno_fts`` sobre
+# ``alumno.nombre_completo``, creado por la migración 3. El tokenizador
+# unicode61 con remove_diacritics ignora mayúsculas y tildes ("perez"
+# encuentra "Pérez") y cada palabra buscada se usa como prefijo ("san"
+# encuentra "Sánchez"). Los triggers de la migración mantienen el índice al
+# día con cualquier INSERT, UPDATE o DELETE sobre ``alumno``.
+#
+# Con una base de datos de servidor, o un SQLite compilado sin FTS5, se
+# busca con LIKE, que distingue tildes.
+import re
+from sqlalchemy.exc import OperationalError
+from modelos import db, Alumno, Curso
+
+TABLA_FTS = 'alumno_fts'
+MAX_RESULTADOS = 50
+
+SQL_INDICE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+            nombre_completo, content='alumno', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS alumno_fts_insertar AFTER INSERT ON alumno BEGIN
+            INSERT INTO {TABLA_FTS}(rowid, nombre_completo) VALUES (new.id, new.nombre_completo);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS alumno_fts_eliminar AFTER DELETE ON alumno BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre_completo)
+            VALUES ('delete', old.id, old.nombre_completo);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS alumno_fts_actualizar AFTER UPDATE OF nombre_completo ON alumno BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre_completo)
+            VALUES ('delete', old.id, old.nombre_completo);
+            INSERT INTO {TABLA_FTS}(rowid, nombre_completo) VALUES (new.id, new.nombre_completo);
+        END""",
+    # Indexar los alumnos que ya existen
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')",
+]
+
+def crear_indice():
+    """Crea el índice FTS5 y sus triggers. Devuelve ``False`` si no se puede
+    (base que no es SQLite o SQLite sin FTS5)."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    try:
+        db.session.execute(db.text('CREATE VIRTUAL TABLE temp.prueba_fts5 USING fts5(x)'))
+        db.session.execute(db.text('DROP TABLE temp.prueba_fts5'))
+    except OperationalError:
+        db.session.rollback()
+        print("SQLite no tiene FTS5; la búsqueda de alumnos usará LIKE")
+        return False
+    for sentencia in SQL_INDICE:
+        db.session.execute(db.text(sentencia))
+    return True
+
+def fts_disponible():
+    return db.engine.dialect.name == 'sqlite' and db.inspect(db.engine).has_table(TABLA_FTS)
+
+def _palabras(texto):
+    return re.findall(r'\w+', texto)
+
+def buscar_alumnos(texto, limite=MAX_RESULTADOS):
+    """Devuelve hasta ``limite`` pares ``(alumno, nombre del curso)``, los
+    más relevantes primero."""
+    palabras = _palabras(texto)
+    if not palabras:
+        return []
+
+    consulta = db.session.query(Alumno, Curso.nombre).join(Curso, Curso.id == Alumno.curso_id)
+    if fts_disponible():
+        # Cada palabra entre comillas (sin operadores FTS) y como prefijo
+        expresion = ' '.join('"{}"*'.format(palabra) for palabra in palabras)
+        ids = [alumno_id for (alumno_id,) in db.session.execute(
+            db.text(f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH :expresion '
+                    'ORDER BY rank LIMIT :limite'),
+            {'expresion': expresion, 'limite': limite})]
+        if not ids:
+            return []
+        posicion = {alumno_id: i for i, alumno_id in enumerate(ids)}
+        return sorted(consulta.filter(Alumno.id.in_(ids)), key=lambda fila: posicion[fila[0].id])
+
+    for palabra in palabras:
+        # Sin comodines: '_' y '%' en el texto buscado son literales, como en FTS5
+        consulta = consulta.filter(Alumno.nombre_completo.icontains(palabra, autoescape=True))
+    return consulta.order_by(Alumno.nombre_completo).limit(limite).all()
@@ -0,0 +1,159 @@
+# Caché de páginas HTML con versión de los datos
+#
+# Las listas de cursos y alumnos cambian pocas veces en el semestre, pero se
+# consultan y renderizan en cada visita. CachePaginas guarda el HTML de las
+# vistas marcadas con @cache_paginas.cachear, con la ruta completa (curso,
+# búsqueda, orden, cursor) y la versión de los datos como clave.
+#
+# La versión se guarda en un archivo de la carpeta instance, así que la
+# comparten todos los workers de gunicorn y la línea de comandos. No hace
+# falta llamarla desde cada ruta: los eventos de la sesión de SQLAlchemy
+# registran cualquier INSERT, UPDATE o DELETE sobre las tablas de datos
+# (también los masivos de importacion.py y planilla.py) y la versión cambia
+# después del commit. Así una página nunca queda guardada con una versión
+# más nueva que sus datos.
+#
+# Cada respuesta lleva un ETag calculado con la versión y la ruta: una
+# visita repetida con If-None-Match recibe 304 sin consultar la base ni
+# renderizar. Las páginas con mensajes flash pendientes no se guardan ni se
+# sirven desde la caché, porque esos mensajes son de cada usuario.
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, current_app, has_app_context, request, session
+from flask.globals import request_ctx
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from modelos import Trabajo, VersionEsquema
+
+# Tablas cuyas escrituras no cambian lo que muestran las páginas
+TABLAS_IGNORADAS = {Trabajo.__tablename__, VersionEsquema.__tablename__}
+
+class CachePaginas:
+    def __init__(self, app=None):
+        self.app = None
+        self._paginas = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_PAGINAS_MAX', 256)  # Páginas por worker; 0 desactiva la caché
+        app.config.setdefault('CACHE_PAGINAS_VERSION', os.path.join(app.instance_path, 'version_datos'))
+        self.app = app
+        app.extensions['cache_paginas'] = self
+
+    # Versión de los datos
+    def version(self):
+        try:
+            with open(self.app.config['CACHE_PAGINAS_VERSION']) as archivo:
+                return archivo.read()
+        except OSError:
+            return '0'
+
+    def nueva_version(self):
+        """Cambia la versión de los datos, con lo que todas las páginas
+        guardadas quedan obsoletas."""
+        ruta = self.app.config['CACHE_PAGINAS_VERSION']
+        # Un valor nuevo en cada cambio (no un contador que se lee y se
+        # incrementa), así dos procesos que escriben a la vez no pueden
+        # dejar la misma versión
+        valor = f'{time.time_ns():x}.{os.getpid():x}'
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+            with os.fdopen(fd, 'w') as archivo:
+                archivo.write(valor)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print(f"No se pudo actualizar la versión de los datos: {e}")
+
+    # Páginas
+    def _obtener(self, version, clave):
+        with self._lock:
+            if version != self._version:
+                # Los datos cambiaron: nada de lo guardado sirve
+                self._paginas.clear()
+                self._version = version
+                return None
+            pagina = self._paginas.get(clave)
+            if pagina is not None:
+                self._paginas.move_to_end(clave)
+            return pagina
+
+    def _guardar(self, version, clave, pagina):
+        with self._lock:
+            if version != self._version:
+                return
+            self._paginas[clave] = pagina
+            while len(self._paginas) > self.app.config['CACHE_PAGINAS_MAX']:
+                self._paginas.popitem(last=False)
+
+    def cachear(self, vista):
+        """Decorador para vistas HTML que sólo dependen de los datos y de la URL."""
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            if (request.method != 'GET' or not current_app.config['CACHE_PAGINAS_MAX']
+                    or session.get('_flashes')):
+                return vista(*args, **kwargs)
+
+            version = self.version()
+            clave = request.full_path
+            etag = hashlib.sha256(f'{version}\0{clave}'.encode('utf-8')).hexdigest()[:32]
+            pagina = self._obtener(version, clave)
+            if pagina is None and etag not in request.if_none_match:
+                respuesta = current_app.make_response(vista(*args, **kwargs))
+                # No guardar errores, redirecciones ni páginas que mostraron
+                # mensajes flash
+                if (respuesta.status_code != 200 or respuesta.is_streamed
+                        or getattr(request_ctx, 'flashes', None)):
+                    return respuesta
+                pagina = (respuesta.get_data(), respuesta.mimetype)
+                self._guardar(version, clave, pagina)
+            if pagina is None:
+                # El cliente ya tiene la página de esta versión
+                respuesta = Response(status=304)
+            else:
+                respuesta = Response(pagina[0], mimetype=pagina[1])
+            respuesta.set_etag(etag)
+            # Las páginas tienen datos personales: sólo en la caché del
+            # navegador, que siempre debe revalidar
+            respuesta.cache_control.private = True
+            respuesta.cache_control.no_cache = True
+            return respuesta.make_conditional(request)
+        return envoltura
+
+# Detección de escrituras: registradas una vez para todas las sesiones
+def _marcar(sesion):
+    sesion.info['cache_paginas_cambios'] = True
+
+@event.listens_for(Session, 'after_flush')
+def _despues_flush(sesion, contexto):
+    for objeto in (*sesion.new, *sesion.dirty, *sesion.deleted):
+        if getattr(objeto, '__tablename__', None) not in TABLAS_IGNORADAS:
+            _marcar(sesion)
+            return
+
+@event.listens_for(Session, 'do_orm_execute')
+def _al_ejecutar(estado):
+    # INSERT, UPDATE y DELETE masivos, que no pasan por el flush
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabla = getattr(estado.statement, 'table', None)
+        if getattr(tabla, 'name', None) not in TABLAS_IGNORADAS:
+            _marcar(estado.session)
+
+@event.listens_for(Session, 'after_commit')
+def _despues_commit(sesion):
+    if sesion.info.pop('cache_paginas_cambios', False) and has_app_context():
+        extension = current_app.extensions.get('cache_paginas')
+        if extension is not None:
+            extension.nueva_version()
+
+@event.listens_for(Session, 'after_rollback')
+def _despues_rollback(sesion):
+    sesion.info.pop('cache_paginas_cambios', None)
@@ -0,0 +1,135 @@
+# Caché en disco de PDFs direccionada por contenido
+#
+# Cada documento se guarda como <clave>.pdf, donde la clave es el hash de los
+# datos que lo generaron (ver reportes.clave_documento). Si los datos no
+# cambian se entrega el archivo ya generado; cualquier edición de notas
+# produce otra clave y por lo tanto un PDF nuevo.
+#
+# La caché es sólo una optimización: si el directorio es None o el disco es
+# de sólo lectura, los PDFs se generan en memoria en cada solicitud.
+#
+# Para no recorrer el directorio en cada escritura (los lotes escriben un PDF
+# por documento), cada proceso lleva la cuenta de los bytes que escribió desde
+# la última revisión y sólo revisa el directorio completo cuando la cuenta
+# supera el límite o pasaron ``intervalo_purga`` segundos; esa revisión
+# también cuenta lo que escribieron los otros workers.
+import os
+import tempfile
+import threading
+import time
+
+class CachePDF:
+    def __init__(self, directorio=None, max_bytes=200 * 1024 * 1024, max_edad=30 * 24 * 3600,
+                 intervalo_purga=300):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_edad = max_edad
+        self.intervalo_purga = intervalo_purga
+        # Tamaño estimado del directorio; None hasta la primera revisión
+        self._total = None
+        self._ultima_purga = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directorio = app.config['PDF_CACHE_DIR']
+        self.max_bytes = app.config['PDF_CACHE_MAX_BYTES']
+        self.max_edad = app.config['PDF_CACHE_MAX_EDAD']
+        self.intervalo_purga = app.config['PDF_CACHE_PURGA']
+        self._total = None
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f'{clave}.pdf')
+
+    def contiene(self, clave):
+        """Indica si el PDF está en caché, sin leerlo."""
+        return bool(self.directorio) and os.path.exists(self._ruta(clave))
+
+    def obtener(self, clave):
+        """Devuelve los bytes del PDF en caché o ``None`` si no existe."""
+        if not self.directorio:
+            return None
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as archivo:
+                contenido = archivo.read()
+        except OSError:
+            return None
+        try:
+            # Marcar el archivo como usado recientemente para la expulsión LRU
+            os.utime(ruta)
+        except OSError:
+            # En un disco de sólo lectura no se puede actualizar la fecha
+            pass
+        return contenido
+
+    def guardar(self, clave, contenido):
+        """Escribe el PDF de forma atómica y, si corresponde, aplica la
+        política de expulsión.
+
+        Devuelve ``False`` si no se pudo escribir (caché desactivada o disco
+        de sólo lectura); el PDF se entrega igual desde memoria.
+        """
+        if not self.directorio:
+            return False
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        except OSError as e:
+            print(f"No se pudo escribir en la caché de PDFs: {e}")
+            return False
+        try:
+            with os.fdopen(fd, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, self._ruta(clave))
+        except OSError as e:
+            os.unlink(temporal)
+            print(f"No se pudo escribir en la caché de PDFs: {e}")
+            return False
+        with self._lock:
+            if self._total is not None:
+                self._total += len(contenido)
+            revisar = (self._total is None or self._total > self.max_bytes
+                       or time.monotonic() - self._ultima_purga >= self.intervalo_purga)
+        if revisar:
+            self.purgar()
+        return True
+
+    def purgar(self):
+        """Elimina los PDFs más antiguos que ``max_edad`` y, si el total
+        supera ``max_bytes``, los menos usados hasta quedar bajo el límite."""
+        if not self.directorio:
+            return
+        try:
+            entradas = [e for e in os.scandir(self.directorio)
+                        if e.is_file() and e.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return
+
+        ahora = time.time()
+        vigentes = []
+        for entrada in entradas:
+            info = entrada.stat()
+            if ahora - info.st_mtime > self.max_edad:
+                self._eliminar(entrada.path)
+            else:
+                vigentes.append((info.st_mtime, info.st_size, entrada.path))
+
+        total = sum(tamano for _, tamano, _ in vigentes)
+        if total > self.max_bytes:
+            # Bajar hasta el 90% del límite, así las escrituras siguientes no
+            # vuelven a revisar el directorio de inmediato
+            for _, tamano, ruta in sorted(vigentes):
+                if total <= self.max_bytes * 0.9:
+                    break
+                self._eliminar(ruta)
+                total -= tamano
+        with self._lock:
+            self._total = total
+            self._ultima_purga = time.monotonic()
+
+    @staticmethod
+    def _eliminar(ruta):
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,248 @@
+# Línea de comandos para administrar el colegio y ejecutar tareas en lote
+#
+# Uso:
+#   python cli.py --help
+#   python cli.py migrar
+#   python cli.py cursos
+#   python cli.py importar-alumnos "1ro C" lista.csv
+#   python cli.py importar-notas "1ro C" notas.csv
+#   python cli.py generar-pdfs salida/ --curso "1ro C"
+#   python cli.py verificar --reparar
+#   python cli.py arranque
+#
+# Pensada para usarse desde cron: la aplicación (Flask, SQLAlchemy, fpdf) se
+# importa recién dentro de cada comando, así que --help responde sin
+# cargarla; los errores terminan con código de salida distinto de 0; y
+# `arranque` mide el tiempo de inicio de los comandos. La base de datos es
+# la misma de la aplicación (DATABASE_URL la reemplaza, ver base_datos.py)
+# y las migraciones pendientes se aplican al iniciar cualquier comando que
+# la use.
+import functools
+import os
+import statistics
+import subprocess
+import sys
+import time
+import click
+
+def con_app(funcion):
+    # Crea la aplicación y ejecuta el comando dentro de su contexto
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        from app import crear_app
+        with crear_app().app_context():
+            return funcion(*args, **kwargs)
+    return envoltura
+
+def _curso(valor):
+    # Curso por id o por nombre (sin distinguir mayúsculas)
+    from modelos import db, Curso
+    if valor.isdigit():
+        curso = db.session.get(Curso, int(valor))
+    else:
+        curso = Curso.query.filter(db.func.lower(Curso.nombre) == valor.lower()).first()
+    if curso is None:
+        raise click.BadParameter(f'No existe el curso {valor!r}', param_hint='CURSO')
+    return curso
+
+def _progreso(hechos, total):
+    click.echo(f'\r{hechos}/{total}', nl=False, err=True)
+    if hechos == total:
+        click.echo(err=True)
+
+@click.group()
+def cli():
+    """Administración del sistema de notas."""
+
+# Base de datos
+@cli.command()
+@con_app
+def migrar():
+    """Aplica las migraciones pendientes y muestra la versión del esquema."""
+    import migraciones
+    click.echo(f'Esquema en la versión {migraciones.version_actual()} '
+               f'(última: {migraciones.ULTIMA_VERSION})')
+
+@cli.command('reiniciar-db')
+@click.confirmation_option(prompt='Se borrarán todos los cursos, alumnos y notas. ¿Continuar?')
+def reiniciar_db():
+    """Borra todas las tablas y crea el esquema desde cero."""
+    from app import crear_app
+    from modelos import db
+    import migraciones
+    app = crear_app()
+    with app.app_context():
+        db.drop_all()
+        db.session.commit()
+    migraciones.actualizar(app)
+    click.echo('Base de datos creada')
+
+@cli.command()
+@con_app
+def cursos():
+    """Lista los cursos con su cantidad de alumnos y promedio."""
+    from modelos import db, Curso, PromedioCurso
+    filas = db.session.query(Curso.id, Curso.nombre, PromedioCurso.cantidad_alumnos, PromedioCurso.promedio)\
+                      .outerjoin(PromedioCurso, PromedioCurso.curso_id == Curso.id)\
+                      .order_by(Curso.nombre)
+    for curso_id, nombre, cantidad, promedio in filas:
+        click.echo(f'{curso_id:>5}  {nombre:<30} {cantidad or 0:>5} alumnos  promedio {promedio or 0:.1f}')
+
+# Importaciones
+@cli.command('importar-alumnos')
+@click.argument('curso')
+@click.argument('archivo', type=click.File('rb'))
+@click.option('--simular', is_flag=True, help='Muestra el resultado sin guardar nada.')
+@con_app
+def importar_alumnos(curso, archivo, simular):
+    """Importa una lista de alumnos (TXT o CSV) al CURSO (id o nombre).
+
+    Un CSV con la columna "curso" puede cargar alumnos de varios cursos.
+    """
+    from modelos import db
+    import importacion
+    reporte = importacion.importar_alumnos(archivo, _curso(curso),
+                                           es_csv=archivo.name.lower().endswith('.csv'))
+    for linea, nombre, _, motivo in reporte.rechazados:
+        click.echo(f'Línea {linea}: {nombre or "(vacía)"} rechazado: {motivo}', err=True)
+    resumen = ', '.join(f'{reporte.contar(estado)} {estado}s' for estado in
+                        (importacion.AGREGADO, importacion.ACTUALIZADO, importacion.EXISTENTE,
+                         importacion.RECHAZADO))
+    if simular:
+        db.session.rollback()
+        click.echo(f'Simulación ({reporte.codificacion}): {resumen}')
+    else:
+        db.session.commit()
+        click.echo(f'Importación terminada ({reporte.codificacion}): {resumen}')
+
+@cli.command('importar-notas')
+@click.argument('curso')
+@click.argument('archivo', type=click.File('rb'))
+@click.option('--simular', is_flag=True, help='Valida el archivo sin guardar nada.')
+@con_app
+def importar_notas(curso, archivo, simular):
+    """Carga las notas del CURSO desde un CSV con las columnas de la planilla.
+
+    Columnas: numero_lista (o alumno_id) y una por asignatura con las notas
+    separadas por espacio o punto y coma. Es el mismo formato que entrega la
+    exportación CSV de la planilla.
+    """
+    from modelos import db
+    import importacion
+    import planilla
+    curso = _curso(curso)
+    contenido = archivo.read()
+    texto = contenido.decode(importacion.detectar_codificacion(contenido), errors='replace')
+    try:
+        cambios = planilla.cambios_desde_csv(texto.lstrip('\ufeff').splitlines(), curso.id)
+        modificadas = planilla.aplicar_cambios(curso.id, cambios)
+    except planilla.ErrorPlanilla as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    if simular:
+        db.session.rollback()
+        click.echo(f'Simulación: se modificarían {modificadas} asignaturas')
+    else:
+        db.session.commit()
+        click.echo(f'Se actualizaron {modificadas} asignaturas')
+
+# Documentos
+@cli.command('generar-pdfs')
+@click.argument('directorio', type=click.Path(file_okay=False))
+@click.option('--curso', 'nombres_cursos', multiple=True,
+              help='Curso (id o nombre); se puede repetir. Por omisión, todos.')
+@click.option('--tipo', type=click.Choice(['informes', 'certificados', 'todo']), default='todo',
+              show_default=True)
+@con_app
+def generar_pdfs(directorio, nombres_cursos, tipo):
+    """Genera los informes de curso y los certificados en DIRECTORIO.
+
+    Usa la caché de PDFs y el pool de procesos de la aplicación: sólo se
+    vuelven a generar los documentos cuyos datos cambiaron.
+    """
+    from modelos import Curso
+    import app
+    import reportes
+    if nombres_cursos:
+        cursos = [_curso(nombre) for nombre in nombres_cursos]
+    else:
+        cursos = Curso.query.order_by(Curso.nombre).all()
+    os.makedirs(directorio, exist_ok=True)
+
+    def guardar(nombre, contenido):
+        with open(os.path.join(directorio, nombre), 'wb') as archivo:
+            archivo.write(contenido)
+
+    if tipo in ('informes', 'todo'):
+        click.echo(f'Informes de {len(cursos)} cursos', err=True)
+        lista = [reportes.datos_informe_curso(curso) for curso in cursos]
+        documentos = app._pdfs_en_cache('informe_curso', lista, reportes.render_informe_curso, _progreso)
+        for curso, (_, contenido) in zip(cursos, documentos):
+            guardar(f'notas_{curso.nombre.replace(" ", "_")}.pdf', contenido)
+    if tipo in ('certificados', 'todo'):
+        for curso in cursos:
+            click.echo(f'Certificados de {curso.nombre}', err=True)
+            documento = app._documento_certificados_curso(curso.id, 'zip', _progreso)
+            guardar(f'certificados_{curso.nombre.replace(" ", "_")}.zip', documento.contenido)
+    click.echo(f'Documentos guardados en {directorio}')
+
+# Mantención
+@cli.command()
+@click.option('--reparar', is_flag=True,
+              help='Reconstruye el resumen de promedios y el índice de búsqueda si están desactualizados.')
+@con_app
+def verificar(reparar):
+    """Revisa la integridad de los datos; termina con código 1 si hay problemas."""
+    import integridad
+    problemas = integridad.verificar()
+    if reparar and any(problema.reparable for problema in problemas):
+        integridad.reparar()
+        click.echo('Se reconstruyeron el resumen de promedios y el índice de búsqueda', err=True)
+        problemas = integridad.verificar()
+    for problema in problemas:
+        click.echo(f'- {problema.descripcion}: {problema.cantidad}', err=True)
+        for ejemplo in problema.ejemplos:
+            click.echo(f'    {ejemplo}', err=True)
+    if problemas:
+        sys.exit(1)
+    click.echo('Sin problemas')
+
+def _medir(argumentos, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__), *argumentos],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+def _importaciones_mas_lentas(argumentos, cantidad):
+    # Módulos que más tardan en importarse según -X importtime, contando sólo
+    # los importados por el programa y los que éstos importan directamente
+    salida = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), *argumentos],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    modulos = []
+    for linea in salida.splitlines():
+        partes = linea.split('|')
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            nombre = partes[2].rstrip()
+            if len(nombre) - len(nombre.lstrip()) <= 3:
+                modulos.append((int(partes[1]), nombre.strip()))
+    return sorted(modulos, reverse=True)[:cantidad]
+
+@cli.command()
+@click.option('--repeticiones', default=5, show_default=True)
+@click.option('--detalle', is_flag=True, help='Muestra los módulos que más tardan en importarse.')
+def arranque(repeticiones, detalle):
+    """Mide el tiempo de inicio de la línea de comandos en un proceso nuevo."""
+    for argumentos in (['--help'], ['cursos']):
+        tiempos = _medir(argumentos, repeticiones)
+        click.echo(f'{" ".join(argumentos):<8} mediana {statistics.median(tiempos) * 1000:6.0f} ms'
+                   f'   mínimo {min(tiempos) * 1000:6.0f} ms')
+    if detalle:
+        click.echo('Importaciones más lentas de "cursos":')
+        for microsegundos, nombre in _importaciones_mas_lentas(['cursos'], 10):
+            click.echo(f'  {microsegundos / 1000:6.0f} ms  {nombre}')
+
+if __name__ == '__main__':
+    cli()
@@ -1,4 +1,5 @@
 from app import app, db, Alumno, Nota
+import migraciones
 
 def reset_db():
     with app.app_context():
@@ -6,10 +7,11 @@ def reset_db():
         db.drop_all()
         print("Tablas eliminadas")
         
-        # Crea las tablas nuevamente
-        db.create_all()
-        print("Base de datos creada exitosamente")
-        
+    # Crea las tablas nuevamente aplicando todas las migraciones
+    migraciones.actualizar(app)
+    print("Base de datos creada exitosamente")
+    
+    with app.app_context():
         # Verifica que las tablas se crearon
         print("\nVerificando tablas:")
         for table in db.metadata.tables.keys():
@@ -21,12 +23,12 @@ def check_db():
         alumnos = Alumno.query.all()
         print("\nAlumnos en la base de datos:")
         for alumno in alumnos:
-            print(f"- {alumno.nombre_completo} ({alumno.curso})")
+            print(f"- {alumno.nombre_completo} ({alumno.curso_rel.nombre})")
             
             # Verifica notas
             for nota in alumno.notas:
-                print(f"  * {nota.asignatura}: {nota.calificaciones}")
+                print(f"  * {nota.asignatura}: {nota.lista_calificaciones}")
 
 if __name__ == "__main__":
     reset_db()
-    check_db()
\ No newline at end of file
+    check_db()
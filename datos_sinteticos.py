@@ -0,0 +1,66 @@
+# Generador de datos sintéticos a escala de colegio
+#
+# Crea cursos × alumnos × asignaturas × notas con INSERT masivos (una
+# sentencia por tabla) y luego reconstruye el resumen de promedios. Con la
+# misma semilla genera siempre los mismos datos, para que los benchmarks
+# sean comparables entre versiones.
+import random
+from modelos import db, ASIGNATURAS, Curso, Alumno, Nota, Calificacion
+import promedios
+
+NOMBRES = ['José', 'María', 'Juan', 'Ana', 'Benjamín', 'Sofía', 'Matías', 'Valentina',
+           'Martín', 'Isidora', 'Tomás', 'Florencia', 'Agustín', 'Antonia', 'Vicente',
+           'Catalina', 'Joaquín', 'Fernanda', 'Cristóbal', 'Ignacia']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+             'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes',
+             'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela',
+             'Castillo', 'Ramírez', 'Reyes', 'Gutiérrez', 'Castro', 'Vargas', 'Álvarez',
+             'Vásquez', 'Tapia', 'Fernández', 'Sánchez', 'Núñez']
+
+def nombre_aleatorio(aleatorio):
+    return f'{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}'
+
+def _insertar(modelo, filas):
+    # INSERT masivo que devuelve los ids en el orden de las filas
+    if not filas:
+        return []
+    return db.session.execute(db.insert(modelo).returning(modelo.id, sort_by_parameter_order=True),
+                              filas).scalars().all()
+
+def generar(cursos=10, alumnos=40, notas=6, semilla=42, prefijo='Curso'):
+    """Agrega ``cursos`` cursos nuevos con ``alumnos`` alumnos cada uno y
+    ``notas`` calificaciones por asignatura. Devuelve los ids de los cursos."""
+    aleatorio = random.Random(semilla)
+
+    existentes = {nombre for (nombre,) in db.session.query(Curso.nombre)}
+    nombres_cursos = []
+    i = 1
+    while len(nombres_cursos) < cursos:
+        nombre = f'{prefijo} {i}'
+        if nombre not in existentes:
+            nombres_cursos.append(nombre)
+        i += 1
+    curso_ids = _insertar(Curso, [{'nombre': nombre} for nombre in nombres_cursos])
+
+    filas_alumnos = [{'nombre_completo': nombre_aleatorio(aleatorio), 'curso_id': curso_id,
+                      'numero_lista': numero}
+                     for curso_id in curso_ids for numero in range(1, alumnos + 1)]
+    alumno_ids = _insertar(Alumno, filas_alumnos)
+
+    nota_ids = _insertar(Nota, [{'alumno_id': alumno_id, 'asignatura': asignatura}
+                                for alumno_id in alumno_ids for asignatura in ASIGNATURAS]
+                               if notas else [])
+
+    # Cada alumno tiene su propio nivel para que los promedios varíen
+    filas_calificaciones = []
+    for indice, nota_id in enumerate(nota_ids):
+        if indice % len(ASIGNATURAS) == 0:
+            nivel = aleatorio.uniform(3.0, 6.5)
+        for posicion in range(1, notas + 1):
+            valor = min(7.0, max(1.0, round(aleatorio.gauss(nivel, 0.8), 1)))
+            filas_calificaciones.append({'nota_id': nota_id, 'posicion': posicion, 'valor': valor})
+    if filas_calificaciones:
+        db.session.execute(db.insert(Calificacion), filas_calificaciones)
+
+    promedios.reconstruir_promedios()
+    return curso_ids
@@ -0,0 +1,164 @@
+# Estadísticas de notas calculadas con NumPy
+#
+# Las notas de uno o más cursos se cargan en una matriz
+# alumnos × asignaturas × notas (NaN donde no hay nota) con dos consultas,
+# y todas las estadísticas se calculan sobre esa matriz sin recorrer alumno
+# por alumno en Python. Los promedios siguen las mismas reglas que el resto
+# de la aplicación: el promedio de un alumno suma los promedios de las
+# asignaturas y divide por la cantidad de asignaturas, contando 0 las que
+# no tienen notas.
+import warnings
+import numpy as np
+from modelos import db, ASIGNATURAS, Curso, Alumno, Nota, Calificacion
+
+NOTA_APROBACION = 4.0
+# Rangos de la distribución: [1, 2), [2, 3), ..., [6, 7]
+RANGOS = np.arange(1.0, 8.0)
+ETIQUETAS_RANGOS = [f'{inicio:.0f}.0-{inicio:.0f}.9' for inicio in RANGOS[:-2]] + ['6.0-7.0']
+
+def cargar_matriz(curso_id=None):
+    """Devuelve ``(alumnos, matriz)``.
+
+    ``alumnos`` es la lista de ``(id, curso_id, numero_lista, nombre)``
+    ordenada por curso y número de lista, y ``matriz[i, j, k]`` la k-ésima
+    nota del alumno i en ``ASIGNATURAS[j]``.
+    """
+    consulta = db.session.query(Alumno.id, Alumno.curso_id, Alumno.numero_lista, Alumno.nombre_completo)
+    if curso_id is not None:
+        consulta = consulta.filter(Alumno.curso_id == curso_id)
+    alumnos = consulta.order_by(Alumno.curso_id, Alumno.numero_lista, Alumno.id).all()
+
+    # Asignatura como índice numérico para leer todo como una matriz de floats
+    columna = db.case({asignatura: j for j, asignatura in enumerate(ASIGNATURAS)}, value=Nota.asignatura)
+    consulta = db.select(Nota.alumno_id, columna, Calificacion.posicion, Calificacion.valor)\
+                 .join(Calificacion, Calificacion.nota_id == Nota.id)\
+                 .filter(Nota.asignatura.in_(ASIGNATURAS))
+    if curso_id is not None:
+        consulta = consulta.join(Alumno, Alumno.id == Nota.alumno_id).filter(Alumno.curso_id == curso_id)
+    # Las tuplas del cursor DBAPI se convierten directo a NumPy, sin crear
+    # un objeto Row por nota
+    resultado = db.session.connection().execute(consulta)
+    notas = np.array(resultado.cursor.fetchall(), dtype=float).reshape(-1, 4)
+    resultado.close()
+
+    if not alumnos or not len(notas):
+        return alumnos, np.full((len(alumnos), len(ASIGNATURAS), 0), np.nan)
+
+    # Fila de cada nota según el id del alumno
+    ids = np.array([alumno[0] for alumno in alumnos])
+    orden = np.argsort(ids)
+    filas = orden[np.searchsorted(ids[orden], notas[:, 0].astype(np.intp))]
+    columnas = notas[:, 1].astype(np.intp)
+
+    # Posición de cada nota dentro de su (alumno, asignatura): se ordena por
+    # alumno, asignatura y posición, y se mide la distancia al inicio del grupo
+    secuencia = np.lexsort((notas[:, 2], columnas, filas))
+    filas, columnas, valores = filas[secuencia], columnas[secuencia], notas[secuencia, 3]
+    grupo = filas * len(ASIGNATURAS) + columnas
+    indices = np.arange(len(grupo))
+    inicio = np.r_[True, grupo[1:] != grupo[:-1]]
+    posiciones = indices - np.maximum.accumulate(np.where(inicio, indices, 0))
+
+    matriz = np.full((len(alumnos), len(ASIGNATURAS), posiciones.max() + 1), np.nan)
+    matriz[filas, columnas, posiciones] = valores
+    return alumnos, matriz
+
+def _numero(valor):
+    # NaN (sin datos) se entrega como None para que sea JSON válido
+    return None if np.isnan(valor) else float(valor)
+
+def _distribucion(valores):
+    valores = valores[~np.isnan(valores)]
+    return np.histogram(valores, bins=RANGOS)[0].tolist()
+
+def _ranking(promedios):
+    # Ranking de competencia: empates comparten el puesto (1, 2, 2, 4)
+    ordenados = np.sort(-promedios)
+    return np.searchsorted(ordenados, -promedios, side='left') + 1
+
+def calcular(alumnos, matriz, incluir_alumnos=True):
+    """Estadísticas de un grupo de alumnos a partir de su matriz de notas."""
+    with warnings.catch_warnings():
+        # Medias y medianas de filas sin notas dan NaN, que es lo esperado
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        # alumnos × asignaturas
+        promedios_asignatura = np.nanmean(matriz, axis=2)
+        con_notas = ~np.isnan(promedios_asignatura)
+        promedios_alumno = np.where(con_notas, promedios_asignatura, 0).sum(axis=1) / len(ASIGNATURAS)
+
+        cantidad, _, maximo_notas = matriz.shape
+        notas_alumno = matriz.reshape(cantidad, len(ASIGNATURAS) * maximo_notas)
+        notas_asignatura = matriz.transpose(1, 0, 2).reshape(len(ASIGNATURAS), cantidad * maximo_notas)
+        reprobadas = (promedios_asignatura < NOTA_APROBACION) & con_notas
+
+        asignaturas = {}
+        for j, asignatura in enumerate(ASIGNATURAS):
+            columna = promedios_asignatura[:, j]
+            notas = notas_asignatura[j]
+            cantidad_notas = int((~np.isnan(notas)).sum())
+            evaluados = int(con_notas[:, j].sum())
+            asignaturas[asignatura] = {
+                'promedio': _numero(np.nanmean(columna)),
+                'mediana': _numero(np.nanmedian(columna)),
+                'desviacion': _numero(np.nanstd(columna)),
+                'minimo': _numero(np.nanmin(notas)) if cantidad_notas else None,
+                'maximo': _numero(np.nanmax(notas)) if cantidad_notas else None,
+                'alumnos_evaluados': evaluados,
+                'cantidad_notas': cantidad_notas,
+                # Alumnos con promedio rojo y notas rojas sobre el total
+                'reprobacion': float(reprobadas[:, j].sum() / evaluados) if evaluados else None,
+                'notas_rojas': float((notas < NOTA_APROBACION).sum() / cantidad_notas)
+                               if cantidad_notas else None,
+                'distribucion': _distribucion(notas),
+            }
+
+        resultado = {
+            'rangos_distribucion': ETIQUETAS_RANGOS,
+            'resumen': {
+                'cantidad_alumnos': cantidad,
+                'promedio': float(promedios_alumno.mean()) if cantidad else 0,
+                'mediana': float(np.median(promedios_alumno)) if cantidad else None,
+                'desviacion': float(promedios_alumno.std()) if cantidad else None,
+                'reprobacion': float((promedios_alumno < NOTA_APROBACION).mean()) if cantidad else None,
+                'distribucion': _distribucion(matriz.ravel()),
+            },
+            'asignaturas': asignaturas,
+        }
+
+        if incluir_alumnos:
+            ranking = _ranking(promedios_alumno)
+            medianas = np.nanmedian(notas_alumno, axis=1)
+            desviaciones = np.nanstd(notas_alumno, axis=1)
+            cantidad_reprobadas = reprobadas.sum(axis=1)
+            resultado['alumnos'] = [{
+                'alumno_id': alumno_id,
+                'numero_lista': numero_lista,
+                'nombre': nombre,
+                'promedio': float(promedios_alumno[i]),
+                'mediana': _numero(medianas[i]),
+                'desviacion': _numero(desviaciones[i]),
+                'asignaturas_reprobadas': int(cantidad_reprobadas[i]),
+                'ranking': int(ranking[i]),
+                'promedios': {asignatura: _numero(promedios_asignatura[i, j])
+                              for j, asignatura in enumerate(ASIGNATURAS)},
+            } for i, (alumno_id, _, numero_lista, nombre) in enumerate(alumnos)]
+    return resultado
+
+def estadisticas_curso(curso):
+    alumnos, matriz = cargar_matriz(curso.id)
+    return dict(calcular(alumnos, matriz), curso_id=curso.id, curso=curso.nombre)
+
+def estadisticas_colegio(incluir_alumnos=False):
+    """Estadísticas de todos los cursos y del colegio con una sola carga."""
+    alumnos, matriz = cargar_matriz()
+    cursos_alumnos = np.fromiter((alumno[1] for alumno in alumnos), dtype=np.intp, count=len(alumnos))
+    cursos = []
+    for curso_id, nombre in db.session.query(Curso.id, Curso.nombre).order_by(Curso.nombre):
+        # Los alumnos vienen ordenados por curso: cada curso es un tramo contiguo
+        desde, hasta = np.searchsorted(cursos_alumnos, [curso_id, curso_id + 1])
+        datos = calcular(alumnos[desde:hasta], matriz[desde:hasta], incluir_alumnos)
+        del datos['rangos_distribucion']
+        cursos.append(dict(datos, curso_id=curso_id, curso=nombre))
+    colegio = calcular(alumnos, matriz, incluir_alumnos=False)
+    return dict(colegio, cursos=cursos)
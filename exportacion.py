@@ -0,0 +1,161 @@
+# Exportación de la planilla de un curso en CSV, XLSX y JSON
+#
+# Alternativa rápida al informe PDF para planillas de cálculo y para subir
+# los datos a otros sistemas. Los tres formatos se escriben fila por fila
+# desde reportes.datos_planilla, el mismo cargador del informe PDF, así que
+# la memoria usada no depende del tamaño del curso.
+#
+# El CSV tiene las columnas que acepta la carga de notas de la planilla
+# (numero_lista, alumno_id y una columna por asignatura con las notas
+# separadas por espacio): un archivo exportado se puede editar y volver a
+# cargar. Las columnas de promedios se ignoran al cargarlo.
+import csv
+import io
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from modelos import db, ASIGNATURAS, PromedioCurso
+import archivo_zip
+import reportes
+
+COLUMNAS = (['numero_lista', 'alumno_id', 'nombre'] + ASIGNATURAS +
+            [f'Promedio {asignatura}' for asignatura in ASIGNATURAS] + ['Promedio'])
+
+# Bytes que se juntan antes de entregar un bloque a la respuesta
+TAMANO_BLOQUE = 64 * 1024
+
+def _en_bloques(partes):
+    # Junta las partes pequeñas (una por fila) en bloques de TAMANO_BLOQUE
+    bloque = []
+    tamano = 0
+    for parte in partes:
+        bloque.append(parte)
+        tamano += len(parte)
+        if tamano >= TAMANO_BLOQUE:
+            yield b''.join(bloque)
+            bloque, tamano = [], 0
+    if bloque:
+        yield b''.join(bloque)
+
+def _notas(valores):
+    return ' '.join(f'{valor:.1f}' for valor in valores)
+
+def _valores(fila):
+    return ([fila['numero_lista'], fila['alumno_id'], fila['nombre']] +
+            [_notas(notas) for notas in fila['notas']] +
+            [round(promedio, 2) for promedio in fila['promedios']] + [round(fila['promedio'], 2)])
+
+# CSV
+def _csv(curso):
+    bufer = io.StringIO()
+    escritor = csv.writer(bufer)
+
+    def linea(valores):
+        escritor.writerow(valores)
+        texto = bufer.getvalue()
+        bufer.seek(0)
+        bufer.truncate()
+        return texto.encode('utf-8')
+
+    # Con BOM, para que Excel lo abra como UTF-8
+    yield '\ufeff'.encode('utf-8') + linea(COLUMNAS)
+    for fila in reportes.datos_planilla(curso.id, con_notas=True):
+        yield linea(_valores(fila))
+
+def csv_en_flujo(curso):
+    return _en_bloques(_csv(curso))
+
+# JSON
+def _json(curso):
+    fila_curso = db.session.get(PromedioCurso, curso.id)
+    cabecera = json.dumps({'curso_id': curso.id, 'curso': curso.nombre, 'asignaturas': ASIGNATURAS,
+                           'promedio_curso': fila_curso.promedio if fila_curso else 0},
+                          ensure_ascii=False)
+    # El objeto se abre sin cerrar para agregar la lista de alumnos
+    yield (cabecera[:-1] + ', "alumnos": [').encode('utf-8')
+    separador = ''
+    for fila in reportes.datos_planilla(curso.id, con_notas=True):
+        alumno = dict(fila, notas=dict(zip(ASIGNATURAS, fila['notas'])),
+                      promedios=dict(zip(ASIGNATURAS, fila['promedios'])))
+        yield (separador + json.dumps(alumno, ensure_ascii=False)).encode('utf-8')
+        separador = ', '
+    yield b']}'
+
+def json_en_flujo(curso):
+    return _en_bloques(_json(curso))
+
+# XLSX: un libro mínimo (sin estilos ni cadenas compartidas) escrito a mano
+# para no depender de openpyxl. La hoja se genera fila por fila dentro del ZIP.
+XLSX_TIPOS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>'''
+XLSX_RELACIONES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+XLSX_LIBRO = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{nombre}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+XLSX_RELACIONES_LIBRO = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>'''
+
+def _letra_columna(indice):
+    # 0 -> A, 25 -> Z, 26 -> AA
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+LETRAS = [_letra_columna(i) for i in range(len(COLUMNAS))]
+
+def _fila_xlsx(numero, valores):
+    celdas = []
+    for letra, valor in zip(LETRAS, valores):
+        referencia = f'{letra}{numero}'
+        if valor is None or valor == '':
+            continue
+        if isinstance(valor, (int, float)):
+            celdas.append(f'<c r="{referencia}"><v>{valor}</v></c>')
+        else:
+            celdas.append(f'<c r="{referencia}" t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>')
+    return f'<row r="{numero}">{"".join(celdas)}</row>'.encode('utf-8')
+
+def _hoja_xlsx(curso):
+    yield (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    yield _fila_xlsx(1, COLUMNAS)
+    for numero, fila in enumerate(reportes.datos_planilla(curso.id, con_notas=True), 2):
+        yield _fila_xlsx(numero, _valores(fila))
+    yield b'</sheetData></worksheet>'
+
+def _nombre_hoja(nombre):
+    # Excel no admite []:*?/\ en el nombre de una hoja, ni más de 31 caracteres
+    return re.sub(r'[\[\]:*?/\\]', ' ', nombre)[:31].strip() or 'Notas'
+
+def xlsx_en_flujo(curso):
+    entradas = [
+        ('[Content_Types].xml', XLSX_TIPOS.encode('utf-8')),
+        ('_rels/.rels', XLSX_RELACIONES.encode('utf-8')),
+        ('xl/workbook.xml', XLSX_LIBRO.format(nombre=escape(_nombre_hoja(curso.nombre),
+                                                             {'"': '&quot;'})).encode('utf-8')),
+        ('xl/_rels/workbook.xml.rels', XLSX_RELACIONES_LIBRO.encode('utf-8')),
+        ('xl/worksheets/sheet1.xml', _en_bloques(_hoja_xlsx(curso))),
+    ]
+    return archivo_zip.zip_en_flujo(entradas, compresion=zipfile.ZIP_DEFLATED)
+
+# formato -> (generador, mimetype)
+FORMATOS = {
+    'csv': (csv_en_flujo, 'text/csv'),
+    'xlsx': (xlsx_en_flujo, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'json': (json_en_flujo, 'application/json'),
+}
@@ -0,0 +1,35 @@
+# Configuración de gunicorn para producción
+#
+# gunicorn lee este archivo desde el directorio de trabajo (Procfile lo pasa
+# también con -c). Cada valor se puede cambiar con variables de entorno.
+#
+# Los workers son gthread: cada uno atiende varias solicitudes a la vez en
+# hilos. La generación de PDFs ocupa la CPU y corre en el pool de procesos
+# de reportes.py, así que un hilo que espera un PDF no retiene el GIL y los
+# demás siguen sirviendo páginas. ControlAdmision (admision.py) limita los
+# PDFs simultáneos de cada worker y responde 503 con Retry-After cuando se
+# llena; prueba_carga.py compara este modo con los workers sync.
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5004')}")
+worker_class = 'gthread'
+
+# Pocos workers con varios hilos: cada worker tiene su propio pool de
+# procesos para PDFs, y los núcleos se reparten entre ellos
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+os.environ.setdefault('NOTAS_PDF_PROCESOS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+# Con gthread el límite aplica al latido del worker, no a cada solicitud;
+# las descargas largas (ZIP del colegio) se envían por partes
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Reiniciar los workers de vez en cuando acota el crecimiento de memoria
+max_requests = 2000
+max_requests_jitter = 200
+
+# GUNICORN_ACCESSLOG vacío desactiva el registro de accesos
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None
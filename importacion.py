@@ -0,0 +1,211 @@
+# Importación de listas de alumnos desde TXT o CSV
+#
+# El archivo se lee por bloques y se decodifica de forma incremental, así
+# que el tamaño de la lista no afecta la memoria usada para leerla. Los
+# alumnos nuevos se insertan por lotes con un solo INSERT por lote.
+#
+# Formatos aceptados:
+# - TXT: un nombre por línea.
+# - CSV: si la primera fila tiene encabezados se usan las columnas
+#   "nombre" (o "nombre_completo"), "numero_lista" y "curso"; si no, la
+#   primera columna es el nombre. Con la columna "curso" un mismo archivo
+#   puede cargar la lista de todo el colegio.
+import codecs
+import csv
+from modelos import db, Alumno, Curso
+import promedios
+
+TAMANO_BLOQUE = 64 * 1024
+TAMANO_LOTE = 500
+
+AGREGADO = 'agregado'
+ACTUALIZADO = 'actualizado'
+EXISTENTE = 'existente'
+RECHAZADO = 'rechazado'
+
+class ReporteImportacion:
+    def __init__(self):
+        self.filas = []
+        self.codificacion = None
+
+    def agregar(self, linea, nombre, estado, motivo=''):
+        self.filas.append((linea, nombre, estado, motivo))
+
+    def contar(self, estado):
+        return sum(1 for fila in self.filas if fila[2] == estado)
+
+    @property
+    def agregados(self):
+        return self.contar(AGREGADO)
+
+    @property
+    def rechazados(self):
+        return [fila for fila in self.filas if fila[2] == RECHAZADO]
+
+def detectar_codificacion(muestra):
+    """Detecta la codificación con el BOM, UTF-8 o chardet si está instalado."""
+    if muestra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # Un carácter multibyte puede quedar cortado al final de la muestra
+        codecs.getincrementaldecoder('utf-8')().decode(muestra)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        import chardet
+        detectada = chardet.detect(muestra).get('encoding')
+        if detectada:
+            return detectada
+    except ImportError:
+        pass
+    # Excel en Windows guarda los CSV en esta codificación
+    return 'cp1252'
+
+def _lineas(stream, codificacion, muestra):
+    decodificador = codecs.getincrementaldecoder(codificacion)(errors='replace')
+    resto = ''
+    bloque = muestra
+    while bloque:
+        lineas = (resto + decodificador.decode(bloque)).splitlines(keepends=True)
+        # La última línea queda pendiente si no terminó en '\n', también si
+        # termina en '\r': el '\n' de un '\r\n' puede venir en el bloque
+        # siguiente y se contaría una línea vacía de más
+        resto = lineas.pop() if lineas and not lineas[-1].endswith('\n') else ''
+        yield from lineas
+        bloque = stream.read(TAMANO_BLOQUE)
+    resto += decodificador.decode(b'', final=True)
+    if resto:
+        yield resto
+
+def _filas(lineas, es_csv):
+    """Genera ``(número de línea, nombre, numero_lista, curso)``."""
+    if not es_csv:
+        for i, linea in enumerate(lineas, 1):
+            yield i, linea, None, None
+        return
+
+    lector = csv.reader(lineas)
+    columnas = None
+    for fila in lector:
+        i = lector.line_num
+        if columnas is None:
+            encabezados = [c.strip().lower() for c in fila]
+            if 'nombre' in encabezados or 'nombre_completo' in encabezados:
+                columnas = {
+                    'nombre': encabezados.index('nombre' if 'nombre' in encabezados else 'nombre_completo'),
+                    'numero_lista': encabezados.index('numero_lista') if 'numero_lista' in encabezados else None,
+                    'curso': encabezados.index('curso') if 'curso' in encabezados else None,
+                }
+                continue
+            columnas = {'nombre': 0, 'numero_lista': None, 'curso': None}
+
+        def columna(nombre):
+            indice = columnas[nombre]
+            return fila[indice] if indice is not None and indice < len(fila) else None
+        yield i, columna('nombre') or '', columna('numero_lista'), columna('curso')
+
+class _EstadoCurso:
+    # Alumnos existentes, números de lista ocupados y último número de un curso
+    def __init__(self, curso):
+        self.curso = curso
+        self.existentes = {}
+        self.numeros = {}
+        self.ultimo_numero = 0
+        for alumno in Alumno.query.filter_by(curso_id=curso.id):
+            self.existentes[alumno.nombre_completo.casefold()] = alumno
+            if alumno.numero_lista is not None:
+                self.numeros[alumno.numero_lista] = alumno.nombre_completo
+            self.ultimo_numero = max(self.ultimo_numero, alumno.numero_lista or 0)
+        self.vistos = set()
+
+def importar_alumnos(stream, curso, es_csv=False):
+    """Importa alumnos desde ``stream`` (binario) al curso indicado.
+
+    Los nombres que ya existen en el curso no se duplican: si el archivo
+    trae un número de lista distinto se actualiza, si no se informan como
+    existentes. Las filas con un número de lista que ya tiene otro alumno
+    del curso se rechazan. No hace commit; devuelve un ``ReporteImportacion``.
+    """
+    reporte = ReporteImportacion()
+    muestra = stream.read(TAMANO_BLOQUE)
+    reporte.codificacion = detectar_codificacion(muestra)
+
+    estados = {curso.nombre.casefold(): _EstadoCurso(curso)}
+    pendientes = []
+
+    def insertar_pendientes():
+        if not pendientes:
+            return
+        ids = db.session.execute(db.insert(Alumno).returning(Alumno.id, Alumno.curso_id),
+                                 pendientes).all()
+        por_curso = {}
+        for alumno_id, curso_id in ids:
+            por_curso.setdefault(curso_id, []).append(alumno_id)
+        for curso_id, alumno_ids in por_curso.items():
+            promedios.registrar_alumnos(curso_id, alumno_ids)
+        pendientes.clear()
+
+    for linea, nombre, numero_lista, nombre_curso in _filas(_lineas(stream, reporte.codificacion, muestra), es_csv):
+        nombre = ' '.join(nombre.split())
+        if not nombre:
+            continue
+        if len(nombre) > Alumno.nombre_completo.type.length:
+            reporte.agregar(linea, nombre, RECHAZADO, 'Nombre demasiado largo')
+            continue
+
+        if numero_lista is not None and numero_lista.strip():
+            try:
+                numero_lista = int(numero_lista)
+            except ValueError:
+                reporte.agregar(linea, nombre, RECHAZADO, f'Número de lista inválido: {numero_lista}')
+                continue
+        else:
+            numero_lista = None
+
+        clave_curso = (nombre_curso or curso.nombre).strip().casefold()
+        estado = estados.get(clave_curso)
+        if estado is None:
+            curso_fila = Curso.query.filter(db.func.lower(Curso.nombre) == clave_curso).first()
+            if curso_fila is None:
+                reporte.agregar(linea, nombre, RECHAZADO, f'El curso "{nombre_curso}" no existe')
+                continue
+            estado = estados[clave_curso] = _EstadoCurso(curso_fila)
+
+        clave = nombre.casefold()
+        if clave in estado.vistos:
+            reporte.agregar(linea, nombre, RECHAZADO, 'Nombre repetido en el archivo')
+            continue
+        estado.vistos.add(clave)
+
+        existente = estado.existentes.get(clave)
+        if (numero_lista is not None and numero_lista in estado.numeros
+                and (existente is None or numero_lista != existente.numero_lista)):
+            estado.vistos.discard(clave)
+            reporte.agregar(linea, nombre, RECHAZADO,
+                            f'El número de lista {numero_lista} ya es de {estado.numeros[numero_lista]}')
+            continue
+
+        if existente is not None:
+            if numero_lista is not None and numero_lista != existente.numero_lista:
+                estado.numeros.pop(existente.numero_lista, None)
+                estado.numeros[numero_lista] = existente.nombre_completo
+                estado.ultimo_numero = max(estado.ultimo_numero, numero_lista)
+                existente.numero_lista = numero_lista
+                reporte.agregar(linea, nombre, ACTUALIZADO, f'Número de lista {numero_lista}')
+            else:
+                reporte.agregar(linea, nombre, EXISTENTE, 'Ya estaba en el curso')
+            continue
+
+        if numero_lista is None:
+            numero_lista = estado.ultimo_numero + 1
+        estado.ultimo_numero = max(estado.ultimo_numero, numero_lista)
+        estado.numeros[numero_lista] = nombre
+        pendientes.append({'nombre_completo': nombre, 'curso_id': estado.curso.id,
+                           'numero_lista': numero_lista})
+        reporte.agregar(linea, nombre, AGREGADO)
+        if len(pendientes) >= TAMANO_LOTE:
+            insertar_pendientes()
+
+    insertar_pendientes()
+    return reporte
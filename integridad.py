@@ -0,0 +1,130 @@
+# Verificación de la integridad de los datos
+#
+# Revisa lo que la base de datos no garantiza por sí sola: registros
+# huérfanos (SQLite no aplica las claves foráneas por omisión), notas fuera
+# de rango, números de lista repetidos y que las tablas de resumen de
+# promedios y el índice de búsqueda estén al día con las notas y alumnos.
+# Con reparar=True se reconstruyen el resumen y el índice; los demás
+# problemas sólo se informan, porque corregirlos requiere decidir qué dato
+# es el bueno.
+from collections import namedtuple
+from sqlalchemy.exc import DatabaseError
+from modelos import (db, ASIGNATURAS, Alumno, Curso, Nota, Calificacion, PromedioAsignatura,
+                     PromedioAlumno, PromedioCurso, cargar_promedios, promedio)
+from planilla import NOTA_MINIMA, NOTA_MAXIMA
+import busqueda
+import promedios
+
+# Diferencia tolerada al comparar promedios guardados con los recalculados
+TOLERANCIA = 1e-6
+# Registros de ejemplo que se muestran por problema
+MAX_EJEMPLOS = 5
+
+Problema = namedtuple('Problema', ['descripcion', 'cantidad', 'ejemplos', 'reparable'])
+
+def _problema(descripcion, filas, reparable=False):
+    filas = list(filas)
+    if filas:
+        return Problema(descripcion, len(filas), filas[:MAX_EJEMPLOS], reparable)
+    return None
+
+def _base_sqlite():
+    if db.engine.dialect.name != 'sqlite':
+        return []
+    resultado = [fila for (fila,) in db.session.execute(db.text('PRAGMA quick_check'))]
+    return [] if resultado == ['ok'] else resultado
+
+def _huerfanos():
+    yield _problema('Alumnos de cursos que no existen',
+                    db.session.query(Alumno.id, Alumno.curso_id)
+                              .outerjoin(Curso, Curso.id == Alumno.curso_id)
+                              .filter(Curso.id.is_(None)))
+    yield _problema('Notas de alumnos que no existen',
+                    db.session.query(Nota.id, Nota.alumno_id)
+                              .outerjoin(Alumno, Alumno.id == Nota.alumno_id)
+                              .filter(Alumno.id.is_(None)))
+    yield _problema('Calificaciones de notas que no existen',
+                    db.session.query(Calificacion.id, Calificacion.nota_id)
+                              .outerjoin(Nota, Nota.id == Calificacion.nota_id)
+                              .filter(Nota.id.is_(None)))
+
+def _datos():
+    yield _problema(f'Calificaciones fuera del rango {NOTA_MINIMA}-{NOTA_MAXIMA}',
+                    db.session.query(Calificacion.id, Calificacion.valor)
+                              .filter(~Calificacion.valor.between(NOTA_MINIMA, NOTA_MAXIMA)))
+    yield _problema('Notas de asignaturas desconocidas',
+                    db.session.query(Nota.id, Nota.asignatura).filter(Nota.asignatura.notin_(ASIGNATURAS)))
+    yield _problema('Números de lista repetidos en un curso',
+                    db.session.query(Alumno.curso_id, Alumno.numero_lista, db.func.count(Alumno.id))
+                              .filter(Alumno.numero_lista.isnot(None))
+                              .group_by(Alumno.curso_id, Alumno.numero_lista)
+                              .having(db.func.count(Alumno.id) > 1))
+
+def _diferentes(guardados, calculados):
+    # Claves cuyo valor guardado falta, sobra o no coincide con el calculado
+    return sorted(clave for clave in guardados.keys() | calculados.keys()
+                  if clave not in guardados or clave not in calculados
+                  or abs(guardados[clave] - calculados[clave]) > TOLERANCIA)
+
+def _promedios():
+    por_asignatura = cargar_promedios()
+    guardados = {(alumno_id, asignatura): valor for alumno_id, asignatura, valor in
+                 db.session.query(PromedioAsignatura.alumno_id, PromedioAsignatura.asignatura,
+                                  PromedioAsignatura.promedio)}
+    yield _problema('Promedios por asignatura desactualizados',
+                    _diferentes(guardados, por_asignatura), reparable=True)
+
+    por_alumno = {}
+    por_curso = {}
+    for alumno_id, curso_id in db.session.query(Alumno.id, Alumno.curso_id):
+        valor = promedio([por_asignatura.get((alumno_id, a), 0) for a in ASIGNATURAS])
+        por_alumno[alumno_id] = valor
+        por_curso.setdefault(curso_id, []).append(valor)
+    guardados = dict(db.session.query(PromedioAlumno.alumno_id, PromedioAlumno.promedio))
+    yield _problema('Promedios de alumnos desactualizados',
+                    _diferentes(guardados, por_alumno), reparable=True)
+
+    por_curso = {curso_id: promedio(valores) for curso_id, valores in por_curso.items()}
+    guardados = dict(db.session.query(PromedioCurso.curso_id, PromedioCurso.promedio)
+                               .filter(PromedioCurso.cantidad_alumnos > 0))
+    yield _problema('Promedios de cursos desactualizados',
+                    _diferentes(guardados, por_curso), reparable=True)
+
+def _indice_busqueda():
+    if not busqueda.fts_disponible():
+        return None
+    tabla = busqueda.TABLA_FTS
+    try:
+        db.session.execute(db.text(f"INSERT INTO {tabla}({tabla}) VALUES ('integrity-check')"))
+    except DatabaseError as e:
+        db.session.rollback()
+        return Problema('Índice de búsqueda dañado', 1, [str(e.orig)], True)
+    # integrity-check no compara con la tabla alumno (contenido externo): las
+    # filas indexadas se cuentan en la tabla auxiliar <tabla>_docsize
+    diferencias = db.session.execute(db.text(
+        f'SELECT id FROM {tabla}_docsize WHERE id NOT IN (SELECT id FROM alumno) '
+        f'UNION ALL SELECT id FROM alumno WHERE id NOT IN (SELECT id FROM {tabla}_docsize)')).scalars()
+    return _problema('Alumnos sobrantes o faltantes en el índice de búsqueda', diferencias, reparable=True)
+
+def verificar():
+    """Devuelve la lista de ``Problema`` encontrados (vacía si todo está bien)."""
+    problemas = []
+    corrupcion = _base_sqlite()
+    if corrupcion:
+        # Con la base dañada el resto de las revisiones no es confiable
+        return [Problema('La base de datos está dañada (PRAGMA quick_check)', len(corrupcion),
+                         corrupcion[:MAX_EJEMPLOS], False)]
+    for revision in (_huerfanos(), _datos(), _promedios()):
+        problemas.extend(problema for problema in revision if problema)
+    indice = _indice_busqueda()
+    if indice:
+        problemas.append(indice)
+    return problemas
+
+def reparar():
+    """Reconstruye el resumen de promedios y el índice de búsqueda."""
+    promedios.reconstruir_promedios()
+    if busqueda.fts_disponible():
+        tabla = busqueda.TABLA_FTS
+        db.session.execute(db.text(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')"))
+        db.session.commit()
@@ -0,0 +1,198 @@
+# Métricas de la aplicación en formato de texto de Prometheus
+#
+# Se registran la latencia de cada solicitud por endpoint, la cantidad y
+# duración de las consultas SQL de cada solicitud (eventos del motor de
+# SQLAlchemy), los tiempos de generación de PDFs y los aciertos de la caché
+# de PDFs. /metrics expone los valores acumulados del proceso; con varios
+# workers de gunicorn cada uno tiene sus propios contadores.
+#
+# Con PERFIL_MUESTREO > 0 se perfila con cProfile esa fracción de las
+# solicitudes y se guarda el resultado en PERFIL_DIR (un archivo .prof por
+# solicitud, para abrir con pstats o snakeviz).
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from modelos import db
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.valores = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        return tuple(etiquetas.get(nombre, '') for nombre in self.etiquetas)
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        with self._lock:
+            valores = sorted(self.valores.items())
+        for clave, valor in valores:
+            lineas.extend(self._lineas(list(zip(self.etiquetas, clave)), valor))
+        return lineas
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self.valores[clave] = self.valores.get(clave, 0) + cantidad
+
+    def _lineas(self, pares, valor):
+        return [f'{self.nombre}{_etiquetas(pares)} {valor}']
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            # [conteo por bucket..., total de observaciones, suma]
+            datos = self.valores.setdefault(clave, [0] * len(self.buckets) + [0, 0])
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    datos[i] += 1
+            datos[-2] += 1
+            datos[-1] += valor
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def _lineas(self, pares, datos):
+        lineas = [f'{self.nombre}_bucket{_etiquetas(pares + [("le", limite)])} {conteo}'
+                  for limite, conteo in zip(self.buckets, datos)]
+        lineas.append(f'{self.nombre}_bucket{_etiquetas(pares + [("le", "+Inf")])} {datos[-2]}')
+        lineas.append(f'{self.nombre}_sum{_etiquetas(pares)} {datos[-1]}')
+        lineas.append(f'{self.nombre}_count{_etiquetas(pares)} {datos[-2]}')
+        return lineas
+
+SOLICITUDES = Contador('notas_solicitudes_total', 'Solicitudes atendidas',
+                       ('endpoint', 'metodo', 'estado'))
+LATENCIA = Histograma('notas_solicitud_segundos', 'Duración de las solicitudes',
+                      ('endpoint', 'metodo'))
+ERRORES = Contador('notas_errores_total', 'Excepciones no controladas', ('endpoint',))
+SQL_CONSULTAS = Contador('notas_sql_consultas_total', 'Consultas SQL ejecutadas', ('endpoint',))
+SQL_SEGUNDOS = Contador('notas_sql_segundos_total', 'Tiempo total en consultas SQL', ('endpoint',))
+SQL_POR_SOLICITUD = Histograma('notas_sql_consultas_por_solicitud', 'Consultas SQL por solicitud',
+                               ('endpoint',), buckets=BUCKETS_CONSULTAS)
+PDF_RENDER = Histograma('notas_pdf_render_segundos', 'Tiempo de generación de PDFs', ('tipo',))
+PDF_CACHE = Contador('notas_pdf_cache_total', 'Consultas a la caché de PDFs', ('tipo', 'resultado'))
+ADMISION_RECHAZOS = Contador('notas_admision_rechazos_total', 'Solicitudes de PDF rechazadas con 503',
+                             ('endpoint',))
+
+REGISTRO = [SOLICITUDES, LATENCIA, ERRORES, SQL_CONSULTAS, SQL_SEGUNDOS, SQL_POR_SOLICITUD,
+            PDF_RENDER, PDF_CACHE, ADMISION_RECHAZOS]
+
+def exponer():
+    """Texto de todas las métricas en el formato de exposición de Prometheus."""
+    return '\n'.join(linea for metrica in REGISTRO for linea in metrica.exponer()) + '\n'
+
+def _endpoint():
+    return request.endpoint or 'desconocido'
+
+class Metricas:
+    def __init__(self, app=None):
+        self.app = None
+        self._perfilando = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PERFIL_MUESTREO', 0.0)  # Fracción de solicitudes a perfilar
+        app.config.setdefault('PERFIL_DIR', os.path.join(app.instance_path, 'perfiles'))
+        app.config.setdefault('PERFIL_MAX_ARCHIVOS', 200)
+        self.app = app
+        app.extensions['metricas'] = self
+        app.before_request(self._antes)
+        app.after_request(self._despues)
+        app.teardown_request(self._al_terminar)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._antes_consulta)
+            event.listen(db.engine, 'after_cursor_execute', self._despues_consulta)
+
+    def _antes(self):
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_sql = [0, 0.0]
+        muestreo = self.app.config['PERFIL_MUESTREO']
+        # cProfile no admite dos perfiles activos a la vez: uno por proceso
+        if muestreo and random.random() < muestreo and self._perfilando.acquire(blocking=False):
+            g.metricas_perfil = cProfile.Profile()
+            g.metricas_perfil.enable()
+
+    def _despues(self, respuesta):
+        if 'metricas_inicio' in g:
+            SOLICITUDES.inc(endpoint=_endpoint(), metodo=request.method, estado=respuesta.status_code)
+        return respuesta
+
+    def _al_terminar(self, error):
+        if 'metricas_inicio' not in g:
+            return
+        endpoint = _endpoint()
+        LATENCIA.observar(time.perf_counter() - g.metricas_inicio, endpoint=endpoint, metodo=request.method)
+        consultas, segundos = g.metricas_sql
+        SQL_POR_SOLICITUD.observar(consultas, endpoint=endpoint)
+        SQL_CONSULTAS.inc(consultas, endpoint=endpoint)
+        SQL_SEGUNDOS.inc(segundos, endpoint=endpoint)
+        if error is not None:
+            ERRORES.inc(endpoint=endpoint)
+        perfil = g.pop('metricas_perfil', None)
+        if perfil is not None:
+            perfil.disable()
+            self._perfilando.release()
+            self._guardar_perfil(perfil, endpoint)
+
+    def _guardar_perfil(self, perfil, endpoint):
+        directorio = self.app.config['PERFIL_DIR']
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            perfil.dump_stats(os.path.join(directorio, f'{time.time():.3f}_{endpoint}.prof'))
+            archivos = sorted(e.path for e in os.scandir(directorio) if e.name.endswith('.prof'))
+            for ruta in archivos[:-self.app.config['PERFIL_MAX_ARCHIVOS']]:
+                os.unlink(ruta)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil: {e}")
+
+    @staticmethod
+    def _antes_consulta(conexion, cursor, sentencia, parametros, contexto, executemany):
+        conexion.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+    @staticmethod
+    def _despues_consulta(conexion, cursor, sentencia, parametros, contexto, executemany):
+        duracion = time.perf_counter() - conexion.info['metricas_inicio'].pop()
+        if has_request_context() and 'metricas_sql' in g:
+            g.metricas_sql[0] += 1
+            g.metricas_sql[1] += duracion
+        else:
+            # Trabajos en segundo plano, migraciones y scripts
+            SQL_CONSULTAS.inc(endpoint='segundo_plano')
+            SQL_SEGUNDOS.inc(duracion, endpoint='segundo_plano')
@@ -0,0 +1,118 @@
+# Migraciones versionadas del esquema
+#
+# Cada migración se aplica una sola vez y queda registrada en la tabla
+# version_esquema. Al arrancar, cada proceso compara la versión registrada
+# con la última conocida; si ya está al día no hace nada más. Si hay
+# migraciones pendientes las aplica con un bloqueo de archivo, para que
+# varios workers de gunicorn no ejecuten DDL al mismo tiempo.
+import os
+from contextlib import contextmanager
+from modelos import db, Alumno, Curso, Nota, VersionEsquema, migrar_calificaciones_texto
+import busqueda
+import promedios
+
+CURSOS_POR_DEFECTO = ['1ro C', '2do C']
+
+def _esquema_inicial():
+    base_nueva = not db.inspect(db.engine).has_table('curso')
+    db.create_all()
+    if base_nueva:
+        for nombre_curso in CURSOS_POR_DEFECTO:
+            db.session.add(Curso(nombre=nombre_curso))
+        db.session.commit()
+    else:
+        # Base creada por versiones anteriores de la aplicación
+        migrar_calificaciones_texto()
+        promedios.reconstruir_promedios()
+
+def _unificar_notas_duplicadas():
+    # Versiones anteriores podían crear dos registros de notas para la misma
+    # asignatura; sus calificaciones se juntan en el primero, en el mismo
+    # orden en que las mostraban los informes
+    duplicadas = db.session.query(Nota.alumno_id, Nota.asignatura)\
+                           .group_by(Nota.alumno_id, Nota.asignatura)\
+                           .having(db.func.count(Nota.id) > 1)\
+                           .all()
+    for alumno_id, asignatura in duplicadas:
+        notas = Nota.query.filter_by(alumno_id=alumno_id, asignatura=asignatura)\
+                          .order_by(Nota.id).all()
+        valores = [valor for nota in notas for valor in nota.lista_calificaciones]
+        notas[0].asignar_calificaciones(valores)
+        for nota in notas[1:]:
+            db.session.delete(nota)
+    db.session.flush()
+
+def _indices():
+    _unificar_notas_duplicadas()
+    for tabla in (Alumno.__table__, Nota.__table__):
+        for indice in tabla.indexes:
+            indice.create(db.session.connection(), checkfirst=True)
+    if db.engine.dialect.name == 'sqlite':
+        # Estadísticas para que el planificador use los índices nuevos
+        db.session.execute(db.text('ANALYZE'))
+
+# (versión, descripción, función); agregar siempre al final
+MIGRACIONES = [
+    (1, 'Esquema inicial y cursos por defecto', _esquema_inicial),
+    (2, 'Índices de alumnos y notas, notas únicas por asignatura', _indices),
+    (3, 'Índice de búsqueda de alumnos (FTS5)', busqueda.crear_indice),
+    (4, 'Índice de alumnos por curso y nombre', _indices),
+]
+
+ULTIMA_VERSION = MIGRACIONES[-1][0]
+
+def version_actual():
+    if not db.inspect(db.engine).has_table(VersionEsquema.__tablename__):
+        return 0
+    return db.session.query(db.func.max(VersionEsquema.version)).scalar() or 0
+
+try:
+    import fcntl
+
+    def _bloquear(archivo):
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+
+    def _desbloquear(archivo):
+        fcntl.flock(archivo, fcntl.LOCK_UN)
+except ImportError:
+    # Windows
+    import msvcrt
+
+    def _bloquear(archivo):
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _desbloquear(archivo):
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def _bloqueo(ruta):
+    """Bloqueo exclusivo entre procesos sobre un archivo."""
+    with open(ruta, 'a+b') as archivo:
+        _bloquear(archivo)
+        try:
+            yield
+        finally:
+            _desbloquear(archivo)
+
+def actualizar(app):
+    """Aplica las migraciones pendientes. Devuelve las versiones aplicadas."""
+    with app.app_context():
+        if version_actual() >= ULTIMA_VERSION:
+            return []
+
+        os.makedirs(app.instance_path, exist_ok=True)
+        with _bloqueo(os.path.join(app.instance_path, 'migraciones.lock')):
+            # Otro proceso pudo aplicarlas mientras se esperaba el bloqueo
+            actual = version_actual()
+            aplicadas = []
+            for version, descripcion, migracion in MIGRACIONES:
+                if version <= actual:
+                    continue
+                print(f"Aplicando migración {version}: {descripcion}")
+                migracion()
+                db.session.add(VersionEsquema(version=version, descripcion=descripcion))
+                db.session.commit()
+                aplicadas.append(version)
+            return aplicadas
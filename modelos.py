@@ -0,0 +1,179 @@
+# Modelos y acceso a datos
+from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+# Constantes
+ASIGNATURAS = [
+    'Matemáticas',
+    'Lenguaje',
+    'Inglés',
+    'Cs. Sociales',
+    'Cs. Naturales',
+    'Instrumental'
+]
+
+# Modelos
+class Curso(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(50), unique=True, nullable=False)
+    alumnos = db.relationship('Alumno', backref='curso_rel', lazy=True)
+
+    def __repr__(self):
+        return self.nombre
+
+class Alumno(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre_completo = db.Column(db.String(100), nullable=False)
+    curso_id = db.Column(db.Integer, db.ForeignKey('curso.id'), nullable=False)
+    numero_lista = db.Column(db.Integer)
+    notas = db.relationship('Nota', backref='alumno', lazy=True, cascade='all, delete-orphan')
+
+    # Las listas de curso filtran por curso y ordenan por número de lista o por nombre
+    __table_args__ = (db.Index('ix_alumno_curso_numero', 'curso_id', 'numero_lista'),
+                      db.Index('ix_alumno_curso_nombre', 'curso_id', 'nombre_completo'))
+
+class Nota(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    asignatura = db.Column(db.String(50), nullable=False)
+    alumno_id = db.Column(db.Integer, db.ForeignKey('alumno.id'), nullable=False)
+    calificaciones = db.relationship('Calificacion', backref='nota', lazy=True,
+                                     cascade='all, delete-orphan',
+                                     order_by='Calificacion.posicion')
+
+    # Un solo registro de notas por alumno y asignatura
+    __table_args__ = (db.Index('ux_nota_alumno_asignatura', 'alumno_id', 'asignatura', unique=True),)
+
+    @property
+    def lista_calificaciones(self):
+        return [c.valor for c in self.calificaciones]
+
+    def asignar_calificaciones(self, valores):
+        """Reemplaza las calificaciones reutilizando las filas existentes."""
+        existentes = list(self.calificaciones)
+        for posicion, valor in enumerate(valores, 1):
+            if posicion <= len(existentes):
+                existentes[posicion - 1].valor = valor
+            else:
+                self.calificaciones.append(Calificacion(posicion=posicion, valor=valor))
+        for sobrante in existentes[len(valores):]:
+            self.calificaciones.remove(sobrante)
+
+class Calificacion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nota_id = db.Column(db.Integer, db.ForeignKey('nota.id'), nullable=False, index=True)
+    posicion = db.Column(db.Integer, nullable=False)
+    valor = db.Column(db.Float, nullable=False)
+
+# Resúmenes de promedios mantenidos por promedios.py
+class PromedioAsignatura(db.Model):
+    alumno_id = db.Column(db.Integer, db.ForeignKey('alumno.id'), primary_key=True)
+    asignatura = db.Column(db.String(50), primary_key=True)
+    promedio = db.Column(db.Float, nullable=False, default=0)
+
+class PromedioAlumno(db.Model):
+    alumno_id = db.Column(db.Integer, db.ForeignKey('alumno.id'), primary_key=True)
+    curso_id = db.Column(db.Integer, db.ForeignKey('curso.id'), nullable=False, index=True)
+    promedio = db.Column(db.Float, nullable=False, default=0)
+
+class PromedioCurso(db.Model):
+    curso_id = db.Column(db.Integer, db.ForeignKey('curso.id'), primary_key=True)
+    promedio = db.Column(db.Float, nullable=False, default=0)
+    cantidad_alumnos = db.Column(db.Integer, nullable=False, default=0)
+
+# Versiones del esquema aplicadas (ver migraciones.py)
+class VersionEsquema(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    descripcion = db.Column(db.String(200), nullable=False)
+    aplicada = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+# Trabajos en segundo plano (ver trabajos.py)
+class Trabajo(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    progreso = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    mensaje = db.Column(db.String(200))
+    archivo = db.Column(db.String(255))
+    nombre_descarga = db.Column(db.String(255))
+    mimetype = db.Column(db.String(100))
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def como_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'progreso': self.progreso,
+            'total': self.total,
+            'mensaje': self.mensaje,
+            'creado': self.creado.isoformat(),
+            'actualizado': self.actualizado.isoformat(),
+        }
+
+# Carga de notas por lotes
+def promedio(valores):
+    return sum(valores) / len(valores) if valores else 0
+
+def _filtrar_notas(consulta, curso_id=None, alumno_id=None):
+    if curso_id is not None:
+        consulta = consulta.join(Alumno, Alumno.id == Nota.alumno_id)\
+                           .filter(Alumno.curso_id == curso_id)
+    if alumno_id is not None:
+        consulta = consulta.filter(Nota.alumno_id == alumno_id)
+    return consulta
+
+def cargar_notas(curso_id=None, alumno_id=None):
+    """Carga en una sola consulta las notas de un curso o de un alumno.
+
+    Devuelve un diccionario ``(alumno_id, asignatura) -> [calificaciones]``
+    para que los informes no recorran ``alumno.notas`` alumno por alumno.
+    """
+    consulta = db.session.query(Nota.alumno_id, Nota.asignatura, Calificacion.valor)\
+                         .join(Calificacion, Calificacion.nota_id == Nota.id)
+    consulta = _filtrar_notas(consulta, curso_id, alumno_id)\
+                         .order_by(Nota.id, Calificacion.posicion)
+
+    notas = {}
+    for id_alumno, asignatura, valor in consulta:
+        notas.setdefault((id_alumno, asignatura), []).append(valor)
+    return notas
+
+def cargar_promedios(curso_id=None, alumno_id=None):
+    """Promedios por asignatura calculados en SQLite con ``AVG()``/``GROUP BY``.
+
+    Devuelve ``(alumno_id, asignatura) -> promedio``; las asignaturas sin
+    notas no aparecen y se consideran 0, igual que en los informes.
+    """
+    consulta = db.session.query(Nota.alumno_id, Nota.asignatura, db.func.avg(Calificacion.valor))\
+                         .join(Calificacion, Calificacion.nota_id == Nota.id)
+    consulta = _filtrar_notas(consulta, curso_id, alumno_id)\
+                         .group_by(Nota.alumno_id, Nota.asignatura)
+    return {(id_alumno, asignatura): valor for id_alumno, asignatura, valor in consulta}
+
+# Migración desde el formato antiguo "5.5,6.0,7.0"
+def migrar_calificaciones_texto():
+    """Convierte la columna ``nota.calificaciones`` (texto) en filas de ``calificacion``.
+
+    Es idempotente: si la columna ya no existe no hace nada. Devuelve la
+    cantidad de calificaciones migradas.
+    """
+    columnas = [c['name'] for c in db.inspect(db.engine).get_columns('nota')]
+    if 'calificaciones' not in columnas:
+        return 0
+
+    Calificacion.__table__.create(db.engine, checkfirst=True)
+    filas = db.session.execute(db.text('SELECT id, calificaciones FROM nota')).all()
+    nuevas = []
+    for nota_id, texto in filas:
+        valores = [float(x) for x in (texto or '').split(',') if x.strip()]
+        nuevas.extend({'nota_id': nota_id, 'posicion': posicion, 'valor': valor}
+                      for posicion, valor in enumerate(valores, 1))
+    if nuevas:
+        db.session.execute(db.insert(Calificacion), nuevas)
+    db.session.execute(db.text('ALTER TABLE nota DROP COLUMN calificaciones'))
+    db.session.commit()
+    return len(nuevas)
@@ -0,0 +1,134 @@
+# Paginación por clave (keyset) para los listados
+#
+# En lugar de OFFSET, cada página pide las filas que siguen a la última fila
+# de la página anterior según las columnas de orden, así que el costo de una
+# página no depende de cuántas filas hay antes. El cursor que viaja en la URL
+# son los valores de esas columnas codificados en base64.
+import base64
+import binascii
+import json
+from modelos import db
+
+POR_PAGINA = 50
+MAX_POR_PAGINA = 200
+
+class Pagina:
+    def __init__(self, filas, siguiente=None, anterior=None):
+        self.filas = filas
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def __len__(self):
+        return len(self.filas)
+
+def codificar_cursor(valores):
+    texto = json.dumps(list(valores), separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor, claves):
+    """Devuelve los valores del cursor o ``None`` si no es válido.
+
+    El cursor viene en la URL, así que cada valor debe ser un escalar del
+    tipo de su columna de orden; si no, se vuelve a la primera página.
+    """
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(claves):
+        return None
+    if not all(_valor_valido(valor, clave) for valor, clave in zip(valores, claves)):
+        return None
+    return valores
+
+def _valor_valido(valor, clave):
+    if valor is None:
+        return _admite_nulos(clave)
+    # bool es subclase de int, pero JSON lo distingue
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float)):
+        return False
+    try:
+        tipo = clave.type.python_type
+    except (AttributeError, NotImplementedError):
+        # Expresión sin tipo conocido: basta con que sea un escalar
+        return True
+    if tipo is float:
+        return isinstance(valor, (int, float))
+    return isinstance(valor, tipo)
+
+def por_pagina(valor):
+    try:
+        return max(1, min(int(valor), MAX_POR_PAGINA))
+    except (TypeError, ValueError):
+        return POR_PAGINA
+
+def _admite_nulos(clave):
+    # Columnas del modelo declaradas sin nullable=False
+    return bool(getattr(getattr(clave, 'expression', None), 'nullable', False))
+
+def _orden(clave, invertir):
+    if not _admite_nulos(clave):
+        return clave.desc() if invertir else clave.asc()
+    # Los NULL primero en orden ascendente, como en el índice de SQLite, así
+    # el índice sirve para el ORDER BY en ambas direcciones
+    return clave.desc().nulls_last() if invertir else clave.asc().nulls_first()
+
+def _siguientes(claves, valores, invertir):
+    # Filas que vienen después del cursor en el orden de la consulta
+    if not any(_admite_nulos(clave) for clave in claves):
+        fila, valor = db.tuple_(*claves), db.tuple_(*[db.literal(v) for v in valores])
+        return fila < valor if invertir else fila > valor
+    # En una comparación de tuplas NULL no es mayor ni menor que nada: se
+    # compara columna por columna, con NULL antes que cualquier valor
+    condiciones, iguales = [], []
+    for clave, valor in zip(claves, valores):
+        if valor is None:
+            sigue = db.false() if invertir else clave.is_not(None)
+            igual = clave.is_(None)
+        else:
+            sigue = clave < valor if invertir else clave > valor
+            if invertir and _admite_nulos(clave):
+                sigue = db.or_(sigue, clave.is_(None))
+            igual = clave == valor
+        condiciones.append(db.and_(*iguales, sigue))
+        iguales.append(igual)
+    return db.or_(*condiciones)
+
+def paginar(consulta, claves, despues=None, antes=None, descendente=False, cantidad=POR_PAGINA):
+    """Devuelve una ``Pagina`` de ``consulta`` ordenada por ``claves``.
+
+    ``claves`` debe identificar cada fila de forma única (por ejemplo,
+    terminar en el id). ``despues`` y ``antes`` son cursores de
+    ``Pagina.siguiente`` y ``Pagina.anterior``. Cada fila de la página es la
+    fila de ``consulta`` sin las columnas de orden.
+    """
+    n = len(claves)
+    hacia_atras = antes is not None and despues is None
+    cursor = decodificar_cursor(antes if hacia_atras else despues, claves)
+    # Para retroceder se recorre en el orden inverso y luego se da vuelta
+    invertir = descendente != hacia_atras
+
+    consulta = consulta.add_columns(*claves)
+    if cursor is not None:
+        consulta = consulta.filter(_siguientes(claves, cursor, invertir))
+    consulta = consulta.order_by(*[_orden(clave, invertir) for clave in claves])
+
+    filas = consulta.limit(cantidad + 1).all()
+    hay_mas = len(filas) > cantidad
+    filas = filas[:cantidad]
+    if hacia_atras:
+        filas.reverse()
+
+    siguiente = anterior = None
+    if filas:
+        primera, ultima = codificar_cursor(filas[0][-n:]), codificar_cursor(filas[-1][-n:])
+        if (hay_mas if not hacia_atras else cursor is not None):
+            siguiente = ultima
+        if (hay_mas if hacia_atras else cursor is not None):
+            anterior = primera
+    return Pagina([tuple(fila[:-n]) for fila in filas], siguiente, anterior)
@@ -0,0 +1,149 @@
+# Planilla de notas de un curso: edición masiva de calificaciones
+#
+# Un lote de cambios ``(alumno, asignatura) -> [calificaciones]`` se aplica
+# en una sola transacción con sentencias masivas: una consulta para las notas
+# actuales, un DELETE y un INSERT por tabla, y el resumen de promedios se
+# recalcula una vez por lote en lugar de una vez por alumno.
+#
+# Formatos aceptados:
+# - JSON: ``{"cambios": [{"alumno_id": 1, "asignatura": "Lenguaje",
+#   "notas": [5.5, 6.0]}, ...]}`` (o directamente la lista de cambios).
+# - CSV: una fila por alumno con la columna "alumno_id" o "numero_lista" y
+#   una columna por asignatura; cada celda trae las notas separadas por
+#   coma, punto y coma o espacio. Las columnas que no son asignaturas (por
+#   ejemplo "nombre") se ignoran.
+# En ambos formatos una lista vacía elimina las notas de la asignatura.
+import csv
+import re
+from modelos import db, ASIGNATURAS, Alumno, Nota, Calificacion, cargar_notas
+import promedios
+
+NOTA_MINIMA = 1.0
+NOTA_MAXIMA = 7.0
+
+class ErrorPlanilla(ValueError):
+    """Cambio inválido; no se aplica ningún cambio del lote."""
+
+def leer_calificaciones(valor):
+    """Convierte ``"5.5, 6.0"`` o ``[5.5, 6.0]`` en una lista de floats."""
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        valor = [parte for parte in re.split(r'[,;\s]+', valor) if parte]
+    try:
+        calificaciones = [float(v) for v in valor]
+    except (TypeError, ValueError):
+        raise ErrorPlanilla(f'Notas inválidas: {valor}')
+    for calificacion in calificaciones:
+        if not NOTA_MINIMA <= calificacion <= NOTA_MAXIMA:
+            raise ErrorPlanilla(f'La nota {calificacion} está fuera del rango '
+                                f'{NOTA_MINIMA}-{NOTA_MAXIMA}')
+    return calificaciones
+
+def _asignatura(nombre):
+    for asignatura in ASIGNATURAS:
+        if asignatura.casefold() == nombre.strip().casefold():
+            return asignatura
+    return None
+
+def cambios_desde_json(datos):
+    cambios = datos.get('cambios') if isinstance(datos, dict) else datos
+    if not isinstance(cambios, list):
+        raise ErrorPlanilla('Se esperaba una lista de cambios')
+    resultado = {}
+    for cambio in cambios:
+        try:
+            alumno_id = int(cambio['alumno_id'])
+            nombre_asignatura = cambio['asignatura']
+        except (KeyError, TypeError, ValueError):
+            raise ErrorPlanilla(f'Cambio inválido: {cambio}')
+        asignatura = _asignatura(str(nombre_asignatura))
+        if asignatura is None:
+            raise ErrorPlanilla(f'Asignatura desconocida: {nombre_asignatura}')
+        resultado[(alumno_id, asignatura)] = leer_calificaciones(cambio.get('notas'))
+    return resultado
+
+def cambios_desde_csv(lineas, curso_id):
+    lector = csv.DictReader(lineas)
+    lector.fieldnames = [columna.strip().lower() for columna in lector.fieldnames or []]
+    columnas = {columna: _asignatura(columna) for columna in lector.fieldnames}
+    if not any(columnas.values()):
+        raise ErrorPlanilla('El CSV no tiene columnas de asignaturas')
+    if 'alumno_id' not in columnas and 'numero_lista' not in columnas:
+        raise ErrorPlanilla('El CSV debe tener la columna "alumno_id" o "numero_lista"')
+
+    por_numero = None
+    if 'alumno_id' not in columnas:
+        por_numero = dict(db.session.query(Alumno.numero_lista, Alumno.id)
+                                    .filter(Alumno.curso_id == curso_id))
+
+    resultado = {}
+    for fila in lector:
+        try:
+            if por_numero is None:
+                alumno_id = int(fila['alumno_id'])
+            else:
+                alumno_id = por_numero[int(fila['numero_lista'])]
+        except (KeyError, TypeError, ValueError):
+            raise ErrorPlanilla(f'Línea {lector.line_num}: alumno no encontrado')
+        for columna, asignatura in columnas.items():
+            if asignatura is not None and fila[columna] is not None:
+                try:
+                    resultado[(alumno_id, asignatura)] = leer_calificaciones(fila[columna])
+                except ErrorPlanilla as e:
+                    raise ErrorPlanilla(f'Línea {lector.line_num}: {e}')
+    return resultado
+
+def cambios_desde_formulario(formulario):
+    # Campos "notas-<alumno_id>-<asignatura>" de la planilla HTML
+    resultado = {}
+    for campo, valor in formulario.items():
+        prefijo, _, resto = campo.partition('-')
+        alumno_id, _, nombre_asignatura = resto.partition('-')
+        if prefijo != 'notas' or not alumno_id.isdigit():
+            continue
+        asignatura = _asignatura(nombre_asignatura)
+        if asignatura is not None:
+            resultado[(int(alumno_id), asignatura)] = leer_calificaciones(valor)
+    return resultado
+
+def aplicar_cambios(curso_id, cambios):
+    """Aplica un lote de cambios a las notas del curso.
+
+    Los cambios que dejan las notas igual que antes se omiten. No hace
+    commit; devuelve la cantidad de asignaturas modificadas.
+    """
+    alumnos = {alumno_id for (alumno_id,) in
+               db.session.query(Alumno.id).filter(Alumno.curso_id == curso_id)}
+    ajenos = sorted({alumno_id for alumno_id, _ in cambios} - alumnos)
+    if ajenos:
+        raise ErrorPlanilla(f'Alumnos que no pertenecen al curso: {ajenos}')
+
+    actuales = cargar_notas(curso_id=curso_id)
+    cambios = {clave: valores for clave, valores in cambios.items()
+               if actuales.get(clave, []) != valores}
+    if not cambios:
+        return 0
+
+    # Se reemplazan las notas completas de cada asignatura modificada
+    anteriores = [nota_id for nota_id, alumno_id, asignatura in
+                  db.session.query(Nota.id, Nota.alumno_id, Nota.asignatura)
+                            .filter(Nota.alumno_id.in_(sorted({a for a, _ in cambios})))
+                  if (alumno_id, asignatura) in cambios]
+    if anteriores:
+        db.session.execute(db.delete(Calificacion).where(Calificacion.nota_id.in_(anteriores)))
+        db.session.execute(db.delete(Nota).where(Nota.id.in_(anteriores)))
+
+    nuevas = [{'alumno_id': alumno_id, 'asignatura': asignatura}
+              for (alumno_id, asignatura), valores in cambios.items() if valores]
+    if nuevas:
+        notas = db.session.execute(db.insert(Nota).returning(Nota.id, Nota.alumno_id, Nota.asignatura),
+                                   nuevas).all()
+        db.session.execute(db.insert(Calificacion), [
+            {'nota_id': nota_id, 'posicion': posicion, 'valor': valor}
+            for nota_id, alumno_id, asignatura in notas
+            for posicion, valor in enumerate(cambios[(alumno_id, asignatura)], 1)
+        ])
+
+    promedios.actualizar_alumnos(curso_id, {alumno_id for alumno_id, _ in cambios})
+    return len(cambios)
@@ -0,0 +1,166 @@
+# Resumen persistente de promedios por alumno, asignatura y curso
+#
+# Las rutas que modifican notas o alumnos llaman a estas funciones antes de
+# hacer commit, de modo que el resumen se actualiza en la misma transacción.
+# Los informes sólo leen las tablas de resumen.
+from modelos import (db, ASIGNATURAS, Alumno, PromedioAsignatura, PromedioAlumno,
+                     PromedioCurso, cargar_promedios, promedio)
+
+def _recalcular_alumno(alumno_id, curso_id):
+    promedios = db.session.query(PromedioAsignatura.promedio)\
+                          .filter(PromedioAsignatura.alumno_id == alumno_id,
+                                  PromedioAsignatura.asignatura.in_(ASIGNATURAS))\
+                          .all()
+    fila = db.session.get(PromedioAlumno, alumno_id)
+    if fila is None:
+        fila = PromedioAlumno(alumno_id=alumno_id, curso_id=curso_id)
+        db.session.add(fila)
+    fila.curso_id = curso_id
+    fila.promedio = sum(p for (p,) in promedios) / len(ASIGNATURAS)
+
+def _recalcular_curso(curso_id):
+    db.session.flush()
+    suma, cantidad = db.session.query(db.func.coalesce(db.func.sum(PromedioAlumno.promedio), 0),
+                                      db.func.count(PromedioAlumno.alumno_id))\
+                               .filter(PromedioAlumno.curso_id == curso_id)\
+                               .one()
+    fila = db.session.get(PromedioCurso, curso_id)
+    if fila is None:
+        fila = PromedioCurso(curso_id=curso_id)
+        db.session.add(fila)
+    fila.cantidad_alumnos = cantidad
+    fila.promedio = suma / cantidad if cantidad else 0
+
+def actualizar_asignatura(alumno, asignatura):
+    """Recalcula el promedio de una asignatura tras editar sus notas."""
+    db.session.flush()
+    valor = cargar_promedios(alumno_id=alumno.id).get((alumno.id, asignatura))
+    fila = db.session.get(PromedioAsignatura, (alumno.id, asignatura))
+    if valor is None:
+        if fila is not None:
+            db.session.delete(fila)
+    elif fila is None:
+        db.session.add(PromedioAsignatura(alumno_id=alumno.id, asignatura=asignatura, promedio=valor))
+    else:
+        fila.promedio = valor
+    db.session.flush()
+    _recalcular_alumno(alumno.id, alumno.curso_id)
+    _recalcular_curso(alumno.curso_id)
+
+def actualizar_alumnos(curso_id, alumno_ids):
+    """Recalcula el resumen de varios alumnos de un curso tras una edición
+    masiva, con una consulta de promedios y un recálculo del curso."""
+    db.session.flush()
+    alumno_ids = sorted(alumno_ids)
+    PromedioAsignatura.query.filter(PromedioAsignatura.alumno_id.in_(alumno_ids)).delete()
+    por_asignatura = {(alumno_id, asignatura): valor
+                      for (alumno_id, asignatura), valor in cargar_promedios(curso_id=curso_id).items()
+                      if alumno_id in alumno_ids}
+    if por_asignatura:
+        db.session.execute(db.insert(PromedioAsignatura), [
+            {'alumno_id': alumno_id, 'asignatura': asignatura, 'promedio': valor}
+            for (alumno_id, asignatura), valor in por_asignatura.items()
+        ])
+    db.session.execute(db.update(PromedioAlumno), [
+        {'alumno_id': alumno_id,
+         'promedio': promedio([por_asignatura.get((alumno_id, a), 0) for a in ASIGNATURAS])}
+        for alumno_id in alumno_ids
+    ])
+    _recalcular_curso(curso_id)
+
+def registrar_alumnos(curso_id, alumno_ids):
+    """Agrega alumnos nuevos (sin notas) al resumen de su curso."""
+    if alumno_ids:
+        db.session.execute(db.insert(PromedioAlumno), [
+            {'alumno_id': alumno_id, 'curso_id': curso_id, 'promedio': 0}
+            for alumno_id in alumno_ids
+        ])
+    _recalcular_curso(curso_id)
+
+def quitar_alumno(alumno):
+    """Elimina al alumno del resumen y recalcula el promedio del curso."""
+    PromedioAsignatura.query.filter_by(alumno_id=alumno.id).delete()
+    PromedioAlumno.query.filter_by(alumno_id=alumno.id).delete()
+    _recalcular_curso(alumno.curso_id)
+
+def quitar_curso(curso_id):
+    PromedioCurso.query.filter_by(curso_id=curso_id).delete()
+
+def resumen_curso(curso_id):
+    """Lee los promedios ya calculados de un curso.
+
+    Devuelve un diccionario con ``asignaturas`` (``(alumno_id, asignatura) ->
+    promedio``), ``alumnos`` (``alumno_id -> promedio``) y ``curso``.
+    """
+    asignaturas = db.session.query(PromedioAsignatura.alumno_id, PromedioAsignatura.asignatura,
+                                   PromedioAsignatura.promedio)\
+                            .join(PromedioAlumno, PromedioAlumno.alumno_id == PromedioAsignatura.alumno_id)\
+                            .filter(PromedioAlumno.curso_id == curso_id)
+    alumnos = db.session.query(PromedioAlumno.alumno_id, PromedioAlumno.promedio)\
+                        .filter(PromedioAlumno.curso_id == curso_id)
+    fila_curso = db.session.get(PromedioCurso, curso_id)
+    return {
+        'asignaturas': {(alumno_id, asignatura): valor for alumno_id, asignatura, valor in asignaturas},
+        'alumnos': dict(alumnos.all()),
+        'curso': fila_curso.promedio if fila_curso else 0,
+    }
+
+def resumen_colegio():
+    """``resumen_curso`` de todos los cursos: ``curso_id -> resumen``."""
+    resumenes = {}
+
+    def resumen(curso_id):
+        return resumenes.setdefault(curso_id, {'asignaturas': {}, 'alumnos': {}, 'curso': 0})
+
+    for curso_id, valor in db.session.query(PromedioCurso.curso_id, PromedioCurso.promedio):
+        resumen(curso_id)['curso'] = valor
+    for alumno_id, curso_id, valor in db.session.query(PromedioAlumno.alumno_id, PromedioAlumno.curso_id,
+                                                       PromedioAlumno.promedio):
+        resumen(curso_id)['alumnos'][alumno_id] = valor
+    asignaturas = db.session.query(PromedioAlumno.curso_id, PromedioAsignatura.alumno_id,
+                                   PromedioAsignatura.asignatura, PromedioAsignatura.promedio)\
+                            .join(PromedioAlumno, PromedioAlumno.alumno_id == PromedioAsignatura.alumno_id)
+    for curso_id, alumno_id, asignatura, valor in asignaturas:
+        resumen(curso_id)['asignaturas'][(alumno_id, asignatura)] = valor
+    return resumenes
+
+def resumen_alumno(alumno_id):
+    """Promedios por asignatura y promedio general de un alumno."""
+    asignaturas = PromedioAsignatura.query.filter_by(alumno_id=alumno_id).all()
+    fila = db.session.get(PromedioAlumno, alumno_id)
+    return {
+        'asignaturas': {p.asignatura: p.promedio for p in asignaturas},
+        'promedio': fila.promedio if fila else 0,
+    }
+
+def reconstruir_promedios():
+    """Reconstruye todo el resumen a partir de las calificaciones.
+
+    Sirve para poblar las tablas en una base existente o para corregirlas si
+    se modificaron notas por fuera de la aplicación.
+    """
+    PromedioAsignatura.query.delete()
+    PromedioAlumno.query.delete()
+    PromedioCurso.query.delete()
+
+    por_asignatura = cargar_promedios()
+    if por_asignatura:
+        db.session.execute(db.insert(PromedioAsignatura), [
+            {'alumno_id': alumno_id, 'asignatura': asignatura, 'promedio': valor}
+            for (alumno_id, asignatura), valor in por_asignatura.items()
+        ])
+
+    por_curso = {}
+    filas_alumnos = []
+    for alumno_id, curso_id in db.session.query(Alumno.id, Alumno.curso_id):
+        valor = promedio([por_asignatura.get((alumno_id, a), 0) for a in ASIGNATURAS])
+        filas_alumnos.append({'alumno_id': alumno_id, 'curso_id': curso_id, 'promedio': valor})
+        por_curso.setdefault(curso_id, []).append(valor)
+    if filas_alumnos:
+        db.session.execute(db.insert(PromedioAlumno), filas_alumnos)
+    if por_curso:
+        db.session.execute(db.insert(PromedioCurso), [
+            {'curso_id': curso_id, 'promedio': promedio(valores), 'cantidad_alumnos': len(valores)}
+            for curso_id, valores in por_curso.items()
+        ])
+    db.session.commit()
@@ -0,0 +1,164 @@
+# Prueba de carga con tráfico de PDFs sobre gunicorn
+#
+# Levanta gunicorn con una base temporal de datos sintéticos y, durante unos
+# segundos, varios clientes descargan certificados (por omisión los de un
+# curso completo en un solo PDF; la caché de PDFs se desactiva, así que cada
+# descarga se genera) mientras otros piden la página principal. Entrega la
+# latencia p50/p95 de cada tipo de solicitud y la cantidad de respuestas 503
+# de la admisión. Con --modos sync gthread se comparan los workers sync de
+# antes con la configuración de gunicorn.conf.py.
+#
+# Uso: python prueba_carga.py [--modos sync gthread] [--segundos 20]
+#                             [--clientes-pdf 8] [--clientes-html 4]
+#                             [--workers 2] [--pdf curso|certificado]
+#                             [--salida resultado.json]
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _preparar_base(ruta, cursos, alumnos):
+    # En un proceso aparte para no cargar Flask y SQLAlchemy en éste
+    codigo = ('from app import crear_app; from modelos import db; import datos_sinteticos\n'
+              f'app = crear_app({{"SQLALCHEMY_DATABASE_URI": "sqlite:///{ruta}"}})\n'
+              'with app.app_context():\n'
+              f'    datos_sinteticos.generar(cursos={cursos}, alumnos={alumnos}, notas=6)\n'
+              '    db.session.commit()\n')
+    subprocess.run([sys.executable, '-c', codigo], cwd=DIRECTORIO, check=True,
+                   stdout=subprocess.DEVNULL)
+
+def _iniciar_servidor(modo, puerto, ruta, workers):
+    entorno = dict(os.environ, DATABASE_URL=f'sqlite:///{ruta}', NOTAS_PDF_CACHE_DIR='null',
+                   WEB_CONCURRENCY=str(workers), GUNICORN_ACCESSLOG='')
+    comando = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{puerto}']
+    if modo == 'sync':
+        # La configuración anterior: un solo hilo por worker
+        comando += ['--worker-class', 'sync', '--threads', '1']
+    comando.append('app:crear_app()')
+    servidor = subprocess.Popen(comando, cwd=DIRECTORIO, env=entorno,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{puerto}/', timeout=2).read()
+            return servidor
+        except OSError:
+            time.sleep(0.2)
+    servidor.terminate()
+    raise RuntimeError(f'gunicorn ({modo}) no respondió')
+
+def _cliente(url_base, rutas, hasta, resultados, espera=0.0):
+    aleatorio = random.Random()
+    while time.monotonic() < hasta:
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url_base + aleatorio.choice(rutas), timeout=60) as respuesta:
+                respuesta.read()
+                estado = respuesta.status
+        except urllib.error.HTTPError as e:
+            estado = e.code
+            if estado == 503:
+                # Respetar el Retry-After como lo haría un navegador que reintenta
+                time.sleep(min(float(e.headers.get('Retry-After', 1)), 1.0))
+        except OSError:
+            estado = 'error'
+        resultados.append((estado, time.perf_counter() - inicio))
+        time.sleep(espera)
+
+def _percentil(valores, p):
+    if len(valores) < 2:
+        return valores[0] if valores else None
+    return statistics.quantiles(valores, n=100)[p - 1]
+
+def _resumen(resultados):
+    ms = sorted(segundos * 1000 for estado, segundos in resultados if estado == 200)
+    return {
+        'ok': len(ms),
+        'rechazadas_503': sum(1 for estado, _ in resultados if estado == 503),
+        'errores': sum(1 for estado, _ in resultados if estado not in (200, 503)),
+        'ms_p50': round(_percentil(ms, 50), 1) if ms else None,
+        'ms_p95': round(_percentil(ms, 95), 1) if ms else None,
+        'ms_max': round(ms[-1], 1) if ms else None,
+    }
+
+def medir(modo, ruta, args):
+    puerto = _puerto_libre()
+    servidor = _iniciar_servidor(modo, puerto, ruta, args.workers)
+    url_base = f'http://127.0.0.1:{puerto}'
+    try:
+        if args.pdf == 'curso':
+            # Los cursos por defecto de la migración inicial están vacíos
+            rutas_pdf = [f'/certificados_curso/{curso_id}?formato=pdf'
+                         for curso_id in range(3, args.cursos + 3)]
+        else:
+            rutas_pdf = [f'/certificado_alumno/{alumno_id}'
+                         for alumno_id in range(1, args.cursos * args.alumnos + 1)]
+        pdf, html = [], []
+        hasta = time.monotonic() + args.segundos
+        hilos = [threading.Thread(target=_cliente, args=(url_base, rutas_pdf, hasta, pdf))
+                 for _ in range(args.clientes_pdf)]
+        hilos += [threading.Thread(target=_cliente, args=(url_base, ['/'], hasta, html, 0.1))
+                  for _ in range(args.clientes_html)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+    return {'pdf': _resumen(pdf), 'html': _resumen(html)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga con tráfico de PDFs')
+    parser.add_argument('--modos', nargs='+', choices=['sync', 'gthread'], default=['sync', 'gthread'])
+    parser.add_argument('--segundos', type=float, default=20)
+    parser.add_argument('--clientes-pdf', type=int, default=8)
+    parser.add_argument('--clientes-html', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--pdf', choices=['curso', 'certificado'], default='curso',
+                        help='Certificados de un curso completo en un PDF, o de un alumno')
+    parser.add_argument('--cursos', type=int, default=4)
+    parser.add_argument('--alumnos', type=int, default=40, help='Alumnos por curso')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el resultado')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta = os.path.join(temporal, 'carga.db')
+        _preparar_base(ruta, args.cursos, args.alumnos)
+        resultado = {
+            'parametros': {'segundos': args.segundos, 'clientes_pdf': args.clientes_pdf,
+                           'clientes_html': args.clientes_html, 'workers': args.workers,
+                           'pdf': args.pdf, 'cpus': os.cpu_count()},
+            'modos': {},
+        }
+        for modo in args.modos:
+            print(f'Midiendo {modo}...', file=sys.stderr)
+            resultado['modos'][modo] = medir(modo, ruta, args)
+
+    print(f'{"modo":<8} {"ruta":<5} {"ok":>6} {"503":>5} {"err":>4} {"p50 ms":>8} {"p95 ms":>8} {"máx ms":>8}')
+    for modo, medidas in resultado['modos'].items():
+        for tipo, datos in medidas.items():
+            print(f'{modo:<8} {tipo:<5} {datos["ok"]:>6} {datos["rechazadas_503"]:>5} {datos["errores"]:>4} '
+                  f'{datos["ms_p50"] or "-":>8} {datos["ms_p95"] or "-":>8} {datos["ms_max"] or "-":>8}')
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,588 @@
+# Generación de informes PDF
+#
+# Las funciones datos_* leen la base de datos y devuelven diccionarios
+# simples; las funciones render_* sólo reciben esos diccionarios y devuelven
+# los bytes del PDF, sin tocar la base ni el disco.
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+import fpdf
+from fpdf import FPDF
+from modelos import (db, ASIGNATURAS, Alumno, Curso, Nota, Calificacion, PromedioAlumno,
+                     PromedioAsignatura, PromedioCurso, cargar_notas)
+import promedios
+
+# Subir este número cuando cambie el diseño de los documentos para que la
+# caché no entregue PDFs generados con la plantilla anterior.
+VERSION_PLANTILLA = 1
+
+# Filas que se traen de la base por vez al leer la planilla de un curso
+FILAS_POR_LOTE = 500
+
+# Recursos del membrete, resueltos una sola vez por proceso
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'logo.png')
+MEMBRETE = 'CEIA Amigos del Padre Hurtado - La Serena'
+_logo_info = None
+_logo_lock = threading.Lock()
+
+def _cargar_logo():
+    """Decodifica el logo la primera vez y guarda el resultado para el proceso.
+
+    Devuelve ``False`` si el logo no existe o no se pudo leer, para no volver
+    a intentarlo en cada página.
+    """
+    global _logo_info
+    with _logo_lock:
+        if _logo_info is None:
+            if not os.path.exists(LOGO_PATH):
+                print(f"Logo no encontrado en: {LOGO_PATH}")
+                _logo_info = False
+            else:
+                try:
+                    _logo_info = _decodificar_png(LOGO_PATH)
+                except Exception as e:
+                    print(f"Error al cargar el logo: {e}")
+                    import traceback
+                    print(traceback.format_exc())
+                    _logo_info = False
+        return _logo_info
+
+# FPDF no tiene una forma pública de reutilizar una imagen decodificada entre
+# documentos: image() vuelve a leer el PNG en cada uno. Estas dos funciones
+# son las únicas que usan sus internos (_parsepng y el diccionario
+# self.images), que dependen de fpdf 1.7.2, la versión fijada en
+# requirements.txt. Con cualquier otra versión, aunque sea menor,
+# _decodificar_png devuelve {} y el logo se dibuja sólo con image().
+VERSION_FPDF_PROBADA = '1.7.2'
+
+def _decodificar_png(ruta):
+    if getattr(fpdf, 'FPDF_VERSION', None) != VERSION_FPDF_PROBADA:
+        return {}
+    return FPDF()._parsepng(ruta)
+
+def _dibujar_imagen(pdf, ruta, info, **posicion):
+    if info and isinstance(getattr(pdf, 'images', None), dict) and ruta not in pdf.images:
+        # Copia por documento: FPDF agrega 'i' y 'n' y borra 'data' al cerrar
+        pdf.images[ruta] = dict(info, i=len(pdf.images) + 1)
+    pdf.image(ruta, **posicion)
+
+# Clase para generar PDFs
+class PDF(FPDF):
+    # Página donde empieza el documento actual; permite numerar desde 1 cada
+    # certificado cuando varios se combinan en un solo PDF
+    primera_pagina = 1
+
+    def header(self):
+        # Logo en la esquina superior izquierda, ya decodificado para no leer
+        # el PNG en cada documento
+        logo = _cargar_logo()
+        if logo is not False:
+            _dibujar_imagen(self, LOGO_PATH, logo, x=10, y=8, w=30)  # Logo más pequeño a la izquierda
+
+        # Texto del membrete al lado del logo
+        self.set_font('Arial', 'B', 15)
+        self.set_xy(45, 15)  # Posición al lado del logo
+        self.cell(0, 10, MEMBRETE, 0, 1, 'L')
+        self.ln(20)
+
+    def create_grade_cell(self, w, h, txt, border=1):
+        # Método auxiliar para crear celdas de notas con borde completo
+        self.cell(w, h, txt, border, 0, 'C')
+
+    def footer(self):
+        self.set_y(-30)
+        self.set_font('Arial', '', 12)
+        self.cell(0, 10, '_'*40, 0, 1, 'C')
+        self.cell(0, 10, 'Jefe de UTP', 0, 1, 'C')
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no() - self.primera_pagina + 1}', 0, 0, 'C')
+
+def clave_documento(tipo, datos):
+    """Hash estable de los datos de un documento y de la versión de la plantilla."""
+    contenido = json.dumps({'tipo': tipo, 'version': VERSION_PLANTILLA, 'datos': datos},
+                           sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+# Datos de los documentos
+def _datos_informe(nombre_curso, alumnos, resumen):
+    return {
+        'curso': nombre_curso,
+        'alumnos': [{
+            'numero_lista': alumno.numero_lista,
+            'nombre': alumno.nombre_completo,
+            'promedios': [resumen['asignaturas'].get((alumno.id, asignatura), 0)
+                          for asignatura in ASIGNATURAS],
+            'promedio': resumen['alumnos'].get(alumno.id, 0),
+        } for alumno in alumnos],
+        'promedio_curso': resumen['curso'],
+    }
+
+def _por_alumno(resultado):
+    # (alumno_id, filas) de un resultado ordenado por alumno
+    return ((alumno_id, list(filas)) for alumno_id, filas in groupby(resultado, key=itemgetter(0)))
+
+def datos_planilla(curso_id, con_notas=False):
+    """Genera una fila por alumno del curso, en orden de lista, con sus
+    promedios y, si se pide, sus notas (``notas[j]`` las de ``ASIGNATURAS[j]``).
+
+    Alumnos, promedios por asignatura y notas se piden en consultas
+    ordenadas igual que se leen por partes a la par, así que la memoria no
+    depende del tamaño del curso.
+    """
+    orden = (Alumno.numero_lista, Alumno.id)
+    por_partes = {'yield_per': FILAS_POR_LOTE}
+    columna = {asignatura: j for j, asignatura in enumerate(ASIGNATURAS)}
+
+    alumnos = db.session.execute(
+        db.select(Alumno.id, Alumno.numero_lista, Alumno.nombre_completo, PromedioAlumno.promedio)
+          .outerjoin(PromedioAlumno, PromedioAlumno.alumno_id == Alumno.id)
+          .filter(Alumno.curso_id == curso_id).order_by(*orden),
+        execution_options=por_partes)
+    promedios_asignatura = _por_alumno(db.session.execute(
+        db.select(Alumno.id, PromedioAsignatura.asignatura, PromedioAsignatura.promedio)
+          .join(PromedioAsignatura, PromedioAsignatura.alumno_id == Alumno.id)
+          .filter(Alumno.curso_id == curso_id).order_by(*orden),
+        execution_options=por_partes))
+    notas = iter(())
+    if con_notas:
+        notas = _por_alumno(db.session.execute(
+            db.select(Alumno.id, Nota.asignatura, Calificacion.valor)
+              .join(Nota, Nota.alumno_id == Alumno.id)
+              .join(Calificacion, Calificacion.nota_id == Nota.id)
+              .filter(Alumno.curso_id == curso_id)
+              .order_by(*orden, Nota.asignatura, Calificacion.posicion),
+            execution_options=por_partes))
+
+    # Un alumno sin promedios o sin notas no aparece en esas consultas
+    siguiente_promedios = next(promedios_asignatura, (None, []))
+    siguiente_notas = next(notas, (None, []))
+    for alumno_id, numero_lista, nombre, promedio in alumnos:
+        fila = {
+            'alumno_id': alumno_id,
+            'numero_lista': numero_lista,
+            'nombre': nombre,
+            'promedios': [0] * len(ASIGNATURAS),
+            'promedio': promedio or 0,
+        }
+        if siguiente_promedios[0] == alumno_id:
+            for _, asignatura, valor in siguiente_promedios[1]:
+                if asignatura in columna:
+                    fila['promedios'][columna[asignatura]] = valor
+            siguiente_promedios = next(promedios_asignatura, (None, []))
+        if con_notas:
+            fila['notas'] = [[] for _ in ASIGNATURAS]
+            if siguiente_notas[0] == alumno_id:
+                for _, asignatura, valor in siguiente_notas[1]:
+                    if asignatura in columna:
+                        fila['notas'][columna[asignatura]].append(valor)
+                siguiente_notas = next(notas, (None, []))
+        yield fila
+
+def datos_informe_curso(curso):
+    alumnos = [{clave: fila[clave] for clave in ('numero_lista', 'nombre', 'promedios', 'promedio')}
+               for fila in datos_planilla(curso.id)]
+    fila_curso = db.session.get(PromedioCurso, curso.id)
+    return {
+        'curso': curso.nombre,
+        'alumnos': alumnos,
+        'promedio_curso': fila_curso.promedio if fila_curso else 0,
+    }
+
+def datos_informes_colegio():
+    """``datos_informe_curso`` de todos los cursos, ordenados por nombre,
+    con una consulta de alumnos y el resumen de todo el colegio."""
+    cursos = Curso.query.order_by(Curso.nombre).all()
+    por_curso = {}
+    for alumno in Alumno.query.order_by(Alumno.curso_id, Alumno.numero_lista):
+        por_curso.setdefault(alumno.curso_id, []).append(alumno)
+    resumenes = promedios.resumen_colegio()
+    vacio = {'asignaturas': {}, 'alumnos': {}, 'curso': 0}
+    return [_datos_informe(curso.nombre, por_curso.get(curso.id, []), resumenes.get(curso.id, vacio))
+            for curso in cursos]
+
+def _fecha_certificado():
+    return datetime.now().strftime('%d de %B de %Y').capitalize()
+
+def datos_certificado(alumno):
+    notas_alumno = cargar_notas(alumno_id=alumno.id)
+    resumen = promedios.resumen_alumno(alumno.id)
+    return {
+        'nombre': alumno.nombre_completo,
+        'curso': alumno.curso_rel.nombre,
+        'asignaturas': [{
+            'nombre': asignatura,
+            'notas': notas_alumno.get((alumno.id, asignatura), []),
+            'promedio': resumen['asignaturas'].get(asignatura, 0),
+        } for asignatura in ASIGNATURAS],
+        'promedio': resumen['promedio'],
+        'fecha': _fecha_certificado(),
+    }
+
+def datos_certificados_curso(curso):
+    """Datos de los certificados de todo un curso con consultas por lotes.
+
+    Equivale a llamar ``datos_certificado`` por cada alumno, pero usa una
+    consulta para los alumnos, una para las notas y el resumen del curso.
+    """
+    alumnos = Alumno.query.filter_by(curso_id=curso.id)\
+                         .order_by(Alumno.numero_lista)\
+                         .all()
+    notas_curso = cargar_notas(curso_id=curso.id)
+    resumen = promedios.resumen_curso(curso.id)
+    fecha = _fecha_certificado()
+    return [{
+        'nombre': alumno.nombre_completo,
+        'curso': curso.nombre,
+        'asignaturas': [{
+            'nombre': asignatura,
+            'notas': notas_curso.get((alumno.id, asignatura), []),
+            'promedio': resumen['asignaturas'].get((alumno.id, asignatura), 0),
+        } for asignatura in ASIGNATURAS],
+        'promedio': resumen['alumnos'].get(alumno.id, 0),
+        'fecha': fecha,
+    } for alumno in alumnos]
+
+# Renderizado
+def render_informe_curso(datos):
+    pdf = PDF()
+    pdf.add_page()
+
+    # Establecer márgenes uniformes
+    margin = 20
+    pdf.set_margins(margin, margin, margin)
+    pdf.set_auto_page_break(True, margin)
+
+    pdf.ln(20)  # Espacio después del membrete
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, f'Informe de Notas - {datos["curso"]}', 0, 1, 'C')
+    pdf.ln(10)
+
+    # Configuración de la tabla
+    page_width = pdf.w - 2*margin
+
+    # Distribución del ancho de columnas
+    col_width_numero = page_width * 0.05  # 5% para número de lista
+    col_width_nombre = page_width * 0.25  # 25% para nombre
+    col_width_nota = page_width * 0.07    # 7% para cada nota (total 42% para 6 notas)
+    col_width_promedio = page_width * 0.08  # 8% para promedio
+
+    # Altura de fila uniforme
+    row_height = 7
+
+    # Encabezados
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(col_width_numero, row_height, 'N°', 1, 0, 'C')
+    pdf.cell(col_width_nombre, row_height, 'Nombre', 1, 0, 'C')
+
+    for asignatura in ASIGNATURAS:
+        pdf.cell(col_width_nota, row_height, asignatura[:4], 1, 0, 'C')
+
+    pdf.cell(col_width_promedio, row_height, 'Prom.', 1, 1, 'C')
+
+    # Datos de alumnos
+    pdf.set_font('Arial', '', 10)
+
+    for alumno in datos['alumnos']:
+        # Número de lista
+        pdf.cell(col_width_numero, row_height, str(alumno['numero_lista']), 1, 0, 'C')
+
+        # Nombre del alumno
+        pdf.cell(col_width_nombre, row_height, alumno['nombre'], 1, 0, 'L')
+
+        # Promedios por asignatura
+        for promedio_asignatura in alumno['promedios']:
+            pdf.cell(col_width_nota, row_height, f'{promedio_asignatura:.1f}', 1, 0, 'C')
+
+        # Promedio del alumno
+        pdf.cell(col_width_promedio, row_height, f'{alumno["promedio"]:.1f}', 1, 1, 'C')
+
+    # Promedio del curso
+    pdf.ln(5)
+    pdf.set_font('Arial', 'B', 11)
+    pdf.cell(0, 10, f'Promedio del Curso: {datos["promedio_curso"]:.1f}', 0, 1, 'C')
+
+    return pdf.output(dest='S').encode('latin-1')
+
+def _valor(numero, formato='{:.1f}'):
+    return '-' if numero is None else formato.format(numero)
+
+def _porcentaje(fraccion):
+    return '-' if fraccion is None else f'{fraccion * 100:.0f}%'
+
+def render_anexo_estadisticas(datos):
+    """Anexo del informe de curso con los datos de ``estadisticas.estadisticas_curso``."""
+    pdf = PDF()
+    pdf.add_page()
+
+    margin = 20
+    pdf.set_margins(margin, margin, margin)
+    pdf.set_auto_page_break(True, margin)
+
+    pdf.ln(20)  # Espacio después del membrete
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, f'Anexo Estadístico - {datos["curso"]}', 0, 1, 'C')
+    pdf.ln(5)
+
+    resumen = datos['resumen']
+    pdf.set_font('Arial', '', 11)
+    pdf.cell(0, 7, f'Alumnos: {resumen["cantidad_alumnos"]}   '
+                   f'Promedio: {_valor(resumen["promedio"])}   '
+                   f'Mediana: {_valor(resumen["mediana"])}   '
+                   f'Desv. estándar: {_valor(resumen["desviacion"], "{:.2f}")}   '
+                   f'Reprobación: {_porcentaje(resumen["reprobacion"])}',
+             0, 1, 'C')
+    pdf.ln(5)
+
+    page_width = pdf.w - 2*margin
+    row_height = 7
+
+    # Estadísticas por asignatura
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, 'Por asignatura', 0, 1)
+    columnas = [('Asignatura', 0.28, 'L'), ('Prom.', 0.12, 'C'), ('Mediana', 0.12, 'C'),
+                ('Desv.', 0.12, 'C'), ('Mín.', 0.12, 'C'), ('Máx.', 0.12, 'C'), ('% Rep.', 0.12, 'C')]
+    pdf.set_font('Arial', 'B', 10)
+    for titulo, ancho, _ in columnas:
+        pdf.cell(page_width * ancho, row_height, titulo, 1, 0, 'C')
+    pdf.ln()
+    pdf.set_font('Arial', '', 10)
+    for asignatura, valores in datos['asignaturas'].items():
+        celdas = [' ' + asignatura, _valor(valores['promedio']), _valor(valores['mediana']),
+                  _valor(valores['desviacion'], '{:.2f}'), _valor(valores['minimo']),
+                  _valor(valores['maximo']), _porcentaje(valores['reprobacion'])]
+        for (_, ancho, alineacion), texto in zip(columnas, celdas):
+            pdf.cell(page_width * ancho, row_height, texto, 1, 0, alineacion)
+        pdf.ln()
+    pdf.ln(5)
+
+    # Distribución de notas: cantidad de notas por rango y asignatura
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, 'Distribución de notas', 0, 1)
+    ancho_rango = page_width * 0.16
+    ancho_columna = (page_width - ancho_rango) / (len(datos['asignaturas']) + 1)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(ancho_rango, row_height, 'Rango', 1, 0, 'C')
+    for asignatura in datos['asignaturas']:
+        pdf.cell(ancho_columna, row_height, asignatura[:4], 1, 0, 'C')
+    pdf.cell(ancho_columna, row_height, 'Total', 1, 1, 'C')
+    pdf.set_font('Arial', '', 10)
+    for i, rango in enumerate(datos['rangos_distribucion']):
+        pdf.cell(ancho_rango, row_height, rango, 1, 0, 'C')
+        for valores in datos['asignaturas'].values():
+            pdf.cell(ancho_columna, row_height, str(valores['distribucion'][i]), 1, 0, 'C')
+        pdf.cell(ancho_columna, row_height, str(resumen['distribucion'][i]), 1, 1, 'C')
+    pdf.ln(5)
+
+    # Ranking del curso
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, 'Ranking', 0, 1)
+    columnas = [('Lugar', 0.10, 'C'), ('N°', 0.08, 'C'), ('Nombre', 0.46, 'L'), ('Prom.', 0.12, 'C'),
+                ('Mediana', 0.12, 'C'), ('Rojos', 0.12, 'C')]
+    pdf.set_font('Arial', 'B', 10)
+    for titulo, ancho, _ in columnas:
+        pdf.cell(page_width * ancho, row_height, titulo, 1, 0, 'C')
+    pdf.ln()
+    pdf.set_font('Arial', '', 10)
+    for alumno in sorted(datos['alumnos'], key=lambda a: (a['ranking'], a['numero_lista'] or 0)):
+        celdas = [str(alumno['ranking']), str(alumno['numero_lista']), ' ' + alumno['nombre'],
+                  _valor(alumno['promedio']), _valor(alumno['mediana']),
+                  str(alumno['asignaturas_reprobadas'])]
+        for (_, ancho, alineacion), texto in zip(columnas, celdas):
+            pdf.cell(page_width * ancho, row_height, texto, 1, 0, alineacion)
+        pdf.ln()
+
+    return pdf.output(dest='S').encode('latin-1')
+
+def render_certificado(datos):
+    pdf = PDF()
+    _dibujar_certificado(pdf, datos)
+    return pdf.output(dest='S').encode('latin-1')
+
+def render_certificados(lista_datos):
+    """Un solo PDF con un certificado por alumno, cada uno en su página."""
+    pdf = PDF()
+    for datos in lista_datos:
+        _dibujar_certificado(pdf, datos)
+    return pdf.output(dest='S').encode('latin-1')
+
+def _dibujar_certificado(pdf, datos):
+    pdf.add_page()
+    pdf.primera_pagina = pdf.page_no()
+
+    # Establecer márgenes uniformes
+    margin = 20
+    pdf.set_margins(margin, margin, margin)
+    pdf.set_auto_page_break(True, margin)
+
+    pdf.ln(20)  # Espacio después del membrete
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'CERTIFICADO DE NOTAS', 0, 1, 'C')
+    pdf.ln(10)
+
+    # Información del alumno
+    pdf.set_font('Arial', '', 12)
+    pdf.cell(0, 10, 'Certifico que el alumno(a):', 0, 1)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, datos['nombre'], 0, 1)
+    pdf.set_font('Arial', '', 12)
+    pdf.cell(0, 10, f'Del curso {datos["curso"]}, tiene las siguientes calificaciones:', 0, 1)
+    pdf.ln(10)
+
+    # Configuración de la tabla
+    page_width = pdf.w - 2*margin
+    max_notas = 7  # N1 a N7
+
+    # Calcular anchos de columna basados en el espacio disponible
+    col_width_asignatura = page_width * 0.25  # 25% del espacio disponible
+    col_width_nota = (page_width * 0.65) / max_notas  # 65% distribuido entre las notas
+    col_width_promedio = page_width * 0.10  # 10% para el promedio
+    row_height = 7
+
+    # Encabezados
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(col_width_asignatura, row_height, 'Asignatura', 1, 0, 'C')
+
+    # Encabezados numerados para las notas
+    for i in range(max_notas):
+        pdf.cell(col_width_nota, row_height, f'N{i+1}', 1, 0, 'C')
+
+    pdf.cell(col_width_promedio, row_height, 'Prom.', 1, 1, 'C')
+
+    # Datos
+    pdf.set_font('Arial', '', 10)
+    for asignatura in datos['asignaturas']:
+        notas_lista = asignatura['notas']
+
+        # Asignatura (alineada a la izquierda con un pequeño padding)
+        pdf.cell(col_width_asignatura, row_height, ' ' + asignatura['nombre'], 1, 0, 'L')
+
+        # Notas en celdas individuales, rellenando con celdas vacías
+        for i in range(max_notas):
+            if i < len(notas_lista):
+                pdf.cell(col_width_nota, row_height, f'{notas_lista[i]:.1f}', 1, 0, 'C')
+            else:
+                pdf.cell(col_width_nota, row_height, '', 1, 0, 'C')
+
+        # Promedio
+        pdf.cell(col_width_promedio, row_height, f'{asignatura["promedio"]:.1f}', 1, 1, 'C')
+
+    # Promedio final
+    pdf.ln(10)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, f'Promedio Final: {datos["promedio"]:.1f}', 0, 1, 'C')
+
+    # Fecha
+    pdf.ln(10)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 10, f'La Serena, {datos["fecha"]}', 0, 1)
+
+# Renderizado en paralelo
+#
+# FPDF es Python puro y ocupa la CPU, así que los lotes grandes se reparten
+# entre procesos. El pool se crea al primer uso dentro de cada proceso (por
+# ejemplo, en cada worker de gunicorn después del fork).
+#
+# Los procesos del pool no se crean con fork: el worker gthread tiene varios
+# hilos y un fork puede copiar un lock tomado por otro hilo, con lo que el
+# proceso hijo queda bloqueado. Se usa forkserver (spawn en Windows). Si un
+# proceso del pool muere (por ejemplo, por falta de memoria) el pool queda
+# inutilizable; se descarta, se crea otro y se reintenta una vez.
+_ejecutor = None
+_procesos = None
+_ejecutor_lock = threading.Lock()
+
+def _contexto():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context('forkserver')
+        # Los procesos del pool parten con este módulo ya importado
+        contexto.set_forkserver_preload([__name__])
+        return contexto
+    return multiprocessing.get_context('spawn')
+
+def ejecutor_pdf(procesos=None):
+    global _ejecutor, _procesos
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _procesos = procesos or os.cpu_count() or 1
+            _ejecutor = ProcessPoolExecutor(max_workers=_procesos, mp_context=_contexto())
+        return _ejecutor
+
+def procesos_pdf():
+    """Cantidad de procesos del pool, o ``None`` si aún no se creó."""
+    return _procesos
+
+def _descartar(ejecutor):
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is ejecutor:
+            _ejecutor = None
+    ejecutor.shutdown(wait=False, cancel_futures=True)
+
+def renderizar(render, datos, procesos=None):
+    """Genera un documento en el pool. El hilo que llama sólo espera el
+    resultado, sin retener el GIL, así que los demás hilos del worker siguen
+    atendiendo solicitudes mientras FPDF trabaja."""
+    for intento in range(2):
+        ejecutor = ejecutor_pdf(procesos)
+        try:
+            return ejecutor.submit(render, datos).result()
+        except BrokenProcessPool:
+            _descartar(ejecutor)
+            if intento:
+                raise
+
+def renderizar_en_flujo(render, lista_datos, procesos=None):
+    """Aplica ``render`` a cada elemento en el pool y entrega los resultados
+    en orden, cada uno apenas está listo.
+
+    Sólo se encargan unos pocos documentos por proceso más allá del que se
+    está entregando, así que los PDFs generados que esperan su turno no
+    dependen del largo de la lista (un ZIP del colegio que se descarga
+    lento no los acumula todos en memoria).
+    """
+    hechos = 0
+    for intento in range(2):
+        if hechos == len(lista_datos):
+            return
+        ejecutor = ejecutor_pdf(procesos)
+        encargados = deque()
+        siguiente = hechos
+        try:
+            while hechos < len(lista_datos):
+                while siguiente < len(lista_datos) and len(encargados) < _procesos * 2:
+                    encargados.append(ejecutor.submit(render, lista_datos[siguiente]))
+                    siguiente += 1
+                contenido = encargados.popleft().result()
+                yield contenido
+                hechos += 1
+            return
+        except BrokenProcessPool:
+            # Se reintentan sólo los documentos que no se alcanzaron a entregar
+            _descartar(ejecutor)
+            if intento:
+                raise
+        finally:
+            # Si se deja de leer a medias, no generar el resto
+            for futuro in encargados:
+                futuro.cancel()
+
+def renderizar_en_paralelo(render, lista_datos, procesos=None, progreso=None):
+    """Aplica ``render`` a cada elemento en el pool y conserva el orden.
+
+    Si se entrega ``progreso(hechos, total)`` se llama a medida que llegan
+    los resultados.
+    """
+    resultados = []
+    for contenido in renderizar_en_flujo(render, lista_datos, procesos):
+        resultados.append(contenido)
+        if progreso:
+            progreso(len(resultados), len(lista_datos))
+    return resultados
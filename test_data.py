@@ -1,4 +1,14 @@
-from app import app, db, Alumno, Nota
+# Carga datos de prueba en la base de la aplicación
+#
+# Uso:
+#   python test_data.py                       tres alumnos de ejemplo
+#   python test_data.py --cursos 10 --alumnos 40 --notas 6
+#                                             datos sintéticos a escala de colegio
+import argparse
+import time
+from app import app, db, Alumno, Curso
+import datos_sinteticos
+import promedios
 
 def add_test_data():
     with app.app_context():
@@ -8,21 +18,46 @@ def add_test_data():
             {"nombre": "María López Silva", "curso": "1ro C"},
             {"nombre": "Pedro Sánchez Ruiz", "curso": "2do C"}
         ]
-        
-        for alumno_data in alumnos_test:
-            alumno = Alumno(
-                nombre_completo=alumno_data["nombre"],
-                curso=alumno_data["curso"]
-            )
-            db.session.add(alumno)
-            print(f"Agregando alumno: {alumno.nombre_completo}")
-        
+
         try:
+            for alumno_data in alumnos_test:
+                curso = Curso.query.filter_by(nombre=alumno_data["curso"]).first()
+                if curso is None:
+                    print(f"No existe el curso {alumno_data['curso']}")
+                    continue
+                ultimo = db.session.query(db.func.max(Alumno.numero_lista))\
+                                   .filter_by(curso_id=curso.id).scalar() or 0
+                alumno = Alumno(
+                    nombre_completo=alumno_data["nombre"],
+                    curso_id=curso.id,
+                    numero_lista=ultimo + 1
+                )
+                db.session.add(alumno)
+                db.session.flush()
+                promedios.registrar_alumnos(curso.id, [alumno.id])
+                print(f"Agregando alumno: {alumno.nombre_completo}")
             db.session.commit()
             print("Datos de prueba agregados exitosamente")
         except Exception as e:
             db.session.rollback()
             print(f"Error al agregar datos: {str(e)}")
 
+def add_synthetic_data(cursos, alumnos, notas, semilla):
+    with app.app_context():
+        inicio = time.perf_counter()
+        datos_sinteticos.generar(cursos=cursos, alumnos=alumnos, notas=notas, semilla=semilla)
+        db.session.commit()
+        print(f"Se agregaron {cursos} cursos con {alumnos} alumnos cada uno "
+              f"en {time.perf_counter() - inicio:.2f} s")
+
 if __name__ == "__main__":
-    add_test_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Carga datos de prueba')
+    parser.add_argument('--cursos', type=int, help='Cursos sintéticos a generar')
+    parser.add_argument('--alumnos', type=int, default=40, help='Alumnos por curso')
+    parser.add_argument('--notas', type=int, default=6, help='Notas por asignatura')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+    if args.cursos:
+        add_synthetic_data(args.cursos, args.alumnos, args.notas, args.semilla)
+    else:
+        add_test_data()
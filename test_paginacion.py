@@ -0,0 +1,50 @@
+# Cursores de paginación manipulados en la URL
+#
+# Uso: python -m pytest test_paginacion.py
+import base64
+import json
+import pytest
+from app import crear_app
+from modelos import db, Alumno, Curso
+import paginacion
+
+def _cursor(valores):
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+MALFORMADOS = [_cursor([{}, 1]), _cursor([[1], 1]), _cursor(['x', 1]), _cursor([1, 'x']),
+               _cursor([True, 1]), _cursor([1]), _cursor({'a': 1}), 'no-es-base64!', _cursor([None, None])]
+
+@pytest.fixture
+def cliente(tmp_path):
+    app = crear_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "notas.db"}',
+                     'CACHE_PAGINAS_VERSION': str(tmp_path / 'version_datos'),
+                     'PDF_CACHE_DIR': None})
+    with app.app_context():
+        curso = Curso.query.first()
+        for i in range(1, 6):
+            db.session.add(Alumno(nombre_completo=f'Alumno {i}', curso_id=curso.id, numero_lista=i))
+        db.session.commit()
+        curso_id = curso.id
+    return app.test_client(), curso_id
+
+def test_cursor_valido():
+    claves = [Alumno.numero_lista, Alumno.id]
+    assert paginacion.decodificar_cursor(_cursor([3, 7]), claves) == [3, 7]
+    # numero_lista admite NULL, el id no
+    assert paginacion.decodificar_cursor(_cursor([None, 7]), claves) == [None, 7]
+
+@pytest.mark.parametrize('cursor', MALFORMADOS)
+def test_cursor_malformado(cursor):
+    assert paginacion.decodificar_cursor(cursor, [Alumno.numero_lista, Alumno.id]) is None
+    assert paginacion.decodificar_cursor(cursor, [Curso.nombre, Curso.id]) in (None, ['x', 1])
+
+@pytest.mark.parametrize('parametro', ['despues', 'antes'])
+@pytest.mark.parametrize('cursor', MALFORMADOS)
+def test_rutas_vuelven_a_la_primera_pagina(cliente, parametro, cursor):
+    cliente, curso_id = cliente
+    respuesta = cliente.get('/', query_string={parametro: cursor})
+    assert respuesta.status_code == 200
+    respuesta = cliente.get(f'/administrar_alumnos/{curso_id}', query_string={parametro: cursor})
+    assert respuesta.status_code == 200
+    assert b'Alumno 1' in respuesta.data
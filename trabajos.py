@@ -0,0 +1,188 @@
+# Cola local de trabajos en segundo plano
+#
+# Los informes pesados se encolan y se ejecutan en hilos del mismo proceso,
+# fuera del hilo de la solicitud. El estado de cada trabajo se guarda en la
+# tabla ``trabajo`` de SQLite, así que cualquier worker de gunicorn puede
+# responder la consulta de estado, y el resultado queda en un archivo que se
+# descarga cuando el trabajo termina.
+#
+# Mientras un proceso tiene trabajos pendientes o en proceso, un hilo renueva
+# su fecha de actualización cada ``TRABAJOS_LATIDO`` segundos. Si el worker
+# se reinicia o muere, sus trabajos dejan de renovarse y después de
+# ``TRABAJOS_SIN_LATIDO`` segundos se informan con error, en vez de quedar
+# pendientes para siempre. La consulta de estado sólo lee: el cambio en la
+# base lo hacen el mismo hilo (a lo más una vez cada TRABAJOS_SIN_LATIDO
+# segundos) y la purga al terminar un trabajo.
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from base_datos import reintentar_si_ocupada
+from modelos import db, Trabajo
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+
+MENSAJE_ABANDONADO = 'El proceso que generaba el documento se detuvo; vuelva a intentarlo'
+
+class ColaTrabajos:
+    def __init__(self, app=None):
+        self.app = None
+        self._ejecutor = None
+        self._activos = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRABAJOS_DIR', os.path.join(app.instance_path, 'trabajos'))
+        app.config.setdefault('TRABAJOS_HILOS', 2)
+        app.config.setdefault('TRABAJOS_MAX_EDAD', 24 * 3600)  # 1 día
+        app.config.setdefault('TRABAJOS_LATIDO', 15)
+        app.config.setdefault('TRABAJOS_SIN_LATIDO', 120)
+        self.app = app
+        app.extensions['trabajos'] = self
+
+    def _obtener_ejecutor(self):
+        # Se crea al primer uso para que cada worker de gunicorn tenga sus hilos
+        with self._lock:
+            if self._ejecutor is None:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.app.config['TRABAJOS_HILOS'],
+                                                    thread_name_prefix='trabajo')
+                threading.Thread(target=self._latir, name='trabajo-latido', daemon=True).start()
+            return self._ejecutor
+
+    def encolar(self, tipo, funcion, *args):
+        """Registra el trabajo y lo ejecuta en segundo plano.
+
+        ``funcion(*args, progreso=...)`` se ejecuta dentro de un contexto de
+        la aplicación y debe devolver un ``Documento``. Devuelve el id.
+        """
+        trabajo = Trabajo(id=uuid.uuid4().hex, tipo=tipo, estado=PENDIENTE)
+        db.session.add(trabajo)
+        db.session.commit()
+        ejecutor = self._obtener_ejecutor()
+        with self._lock:
+            self._activos.add(trabajo.id)
+        ejecutor.submit(self._ejecutar, trabajo.id, funcion, args)
+        return trabajo.id
+
+    def _ejecutar(self, trabajo_id, funcion, args):
+        with self.app.app_context():
+            try:
+                self._actualizar(trabajo_id, estado=EN_PROCESO)
+
+                ultimo = [0.0]
+
+                def progreso(hechos, total):
+                    # Limitar las escrituras a la base a unas pocas por segundo
+                    ahora = time.monotonic()
+                    if hechos == total or ahora - ultimo[0] >= 0.5:
+                        ultimo[0] = ahora
+                        self._actualizar(trabajo_id, progreso=hechos, total=total)
+
+                documento = funcion(*args, progreso=progreso)
+                os.makedirs(self.app.config['TRABAJOS_DIR'], exist_ok=True)
+                ruta = self._ruta(trabajo_id)
+                # Los documentos generados por partes (ZIP del colegio) tardan
+                # en escribirse: se escriben aparte y sólo el archivo completo
+                # queda con el nombre que se descarga
+                with open(ruta + '.parcial', 'wb') as archivo:
+                    if isinstance(documento.contenido, bytes):
+                        archivo.write(documento.contenido)
+                    else:
+                        for bloque in documento.contenido:
+                            archivo.write(bloque)
+                os.replace(ruta + '.parcial', ruta)
+                self._actualizar(trabajo_id, estado=TERMINADO, archivo=ruta,
+                                 nombre_descarga=documento.nombre, mimetype=documento.mimetype)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error en el trabajo {trabajo_id}: {e}")
+                self._actualizar(trabajo_id, estado=ERROR, mensaje=str(e)[:200])
+                _eliminar(self._ruta(trabajo_id) + '.parcial')
+            finally:
+                with self._lock:
+                    self._activos.discard(trabajo_id)
+                self.purgar()
+                db.session.remove()
+
+    def _ruta(self, trabajo_id):
+        return os.path.join(self.app.config['TRABAJOS_DIR'], trabajo_id)
+
+    def _latir(self):
+        ultima_revision = time.monotonic()
+        while True:
+            time.sleep(self.app.config['TRABAJOS_LATIDO'])
+            with self._lock:
+                activos = list(self._activos)
+            revisar = time.monotonic() - ultima_revision >= self.app.config['TRABAJOS_SIN_LATIDO']
+            if not activos and not revisar:
+                continue
+            with self.app.app_context():
+                try:
+                    if activos:
+                        self._renovar(activos)
+                    if revisar:
+                        ultima_revision = time.monotonic()
+                        self.marcar_abandonados()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"No se pudo renovar el estado de los trabajos: {e}")
+                finally:
+                    db.session.remove()
+
+    @reintentar_si_ocupada()
+    def _renovar(self, trabajo_ids):
+        Trabajo.query.filter(Trabajo.id.in_(trabajo_ids), Trabajo.estado.in_([PENDIENTE, EN_PROCESO]))\
+                     .update({'actualizado': datetime.now()}, synchronize_session=False)
+        db.session.commit()
+
+    def _limite_latido(self):
+        return datetime.now() - timedelta(seconds=self.app.config['TRABAJOS_SIN_LATIDO'])
+
+    def abandonado(self, trabajo):
+        """Indica si el trabajo dejó de renovarse porque el worker que lo
+        ejecutaba terminó, aunque todavía no se haya marcado en la base."""
+        return trabajo.estado in (PENDIENTE, EN_PROCESO) and trabajo.actualizado < self._limite_latido()
+
+    @reintentar_si_ocupada()
+    def marcar_abandonados(self):
+        """Marca con error en la base los trabajos abandonados."""
+        Trabajo.query.filter(Trabajo.estado.in_([PENDIENTE, EN_PROCESO]),
+                             Trabajo.actualizado < self._limite_latido())\
+                     .update({'estado': ERROR, 'actualizado': datetime.now(), 'mensaje': MENSAJE_ABANDONADO},
+                             synchronize_session=False)
+        db.session.commit()
+
+    @reintentar_si_ocupada()
+    def _actualizar(self, trabajo_id, **valores):
+        trabajo = db.session.get(Trabajo, trabajo_id)
+        for campo, valor in valores.items():
+            setattr(trabajo, campo, valor)
+        db.session.commit()
+
+    @reintentar_si_ocupada()
+    def purgar(self):
+        """Elimina los trabajos terminados hace más de ``TRABAJOS_MAX_EDAD``."""
+        self.marcar_abandonados()
+        limite = datetime.now() - timedelta(seconds=self.app.config['TRABAJOS_MAX_EDAD'])
+        antiguos = Trabajo.query.filter(Trabajo.estado.in_([TERMINADO, ERROR]),
+                                        Trabajo.actualizado < limite).all()
+        for trabajo in antiguos:
+            if trabajo.archivo:
+                _eliminar(trabajo.archivo)
+            # El archivo a medio escribir de un trabajo cuyo worker terminó
+            _eliminar(self._ruta(trabajo.id) + '.parcial')
+            db.session.delete(trabajo)
+        db.session.commit()
+
+def _eliminar(ruta):
+    try:
+        os.unlink(ruta)
+    except FileNotFoundError:
+        pass